@@ -3,3 +3,8 @@ from django.apps import AppConfig
 
 class ApiConfig(AppConfig):
     name = 'api'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        # Модули с разделами /metrics/ регистрируют их при импорте.
+        from . import outbox  # noqa: F401
@@ -0,0 +1,185 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import router
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import (AuthenticationFailed,
+                                                 InvalidToken)
+from rest_framework_simplejwt.settings import api_settings
+
+from reviews.models import User
+from .metrics import register
+from .revocation import revocation_list
+from .tokens import (get_token_state, has_role_claims, is_revoked_for_user,
+                     user_from_token)
+
+
+class UserCache:
+    """ Пользователи по id, которые держатся в памяти процесса
+        USER_CACHE_TIMEOUT секунд. Любое сохранение пользователя
+        выкидывает его из кэша этого процесса, а короткое время жизни
+        ограничивает устаревание в остальных процессах. """
+
+    def __init__(self, model):
+        self.model = model
+        self.lock = threading.Lock()
+        self.rows = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id):
+        """ Новый объект пользователя на каждый вызов: запрос может
+            менять его поля, не задевая кэш. None - нет такого. """
+        now = time.monotonic()
+        entry = self.rows.get(user_id)
+        if entry is not None and entry[0] > now:
+            self.hits += 1
+            return self.build(entry[1])
+        self.misses += 1
+        user = self.model.objects.filter(pk=user_id).first()
+        if user is None:
+            return None
+        values = tuple(
+            getattr(user, field.attname)
+            for field in self.model._meta.concrete_fields
+        )
+        with self.lock:
+            self.rows[user_id] = (now + settings.USER_CACHE_TIMEOUT, values)
+        return user
+
+    def build(self, values):
+        field_names = [
+            field.attname for field in self.model._meta.concrete_fields
+        ]
+        db = router.db_for_read(self.model)
+        return self.model.from_db(db, field_names, values)
+
+    def invalidate(self, user_id):
+        with self.lock:
+            self.rows.pop(user_id, None)
+
+    def clear(self):
+        with self.lock:
+            self.rows.clear()
+
+    def stats(self):
+        return {'size': len(self.rows), 'hits': self.hits,
+                'misses': self.misses}
+
+
+user_cache = UserCache(User)
+register('user_cache')(user_cache.stats)
+
+
+class TokenCache:
+    """ LRU уже проверенных токенов: sha256 сырого токена -> токен.
+        Запись живет не дольше TOKEN_CACHE_TIMEOUT секунд и не дольше
+        срока действия самого токена, поэтому истекший токен все равно
+        отвергается. """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.tokens = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def digest(raw_token):
+        if isinstance(raw_token, str):
+            raw_token = raw_token.encode()
+        return hashlib.sha256(raw_token).digest()
+
+    def get(self, raw_token):
+        key = self.digest(raw_token)
+        with self.lock:
+            entry = self.tokens.get(key)
+            if entry is not None and entry[0] > time.time():
+                self.tokens.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self.tokens[key]
+            self.misses += 1
+        return None
+
+    def set(self, raw_token, validated_token):
+        expires = min(time.time() + settings.TOKEN_CACHE_TIMEOUT,
+                      validated_token.get('exp', 0))
+        key = self.digest(raw_token)
+        with self.lock:
+            self.tokens[key] = (expires, validated_token)
+            self.tokens.move_to_end(key)
+            while len(self.tokens) > settings.TOKEN_CACHE_SIZE:
+                self.tokens.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.tokens.clear()
+
+    def stats(self):
+        return {'size': len(self.tokens), 'hits': self.hits,
+                'misses': self.misses}
+
+
+token_cache = TokenCache()
+register('token_cache')(token_cache.stats)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """ JWTAuthentication без проверки подписи и SELECT пользователя
+        на каждый запрос. Токены с ролью (RoleRefreshToken) превращаются
+        в пользователя прямо из claims, если версия прав в токене не
+        устарела; для остальных пользователь берется из кэша процесса.
+        Токены, выписанные до tokens_revoked_at пользователя, отвергаются
+        в обоих случаях. """
+
+    def get_validated_token(self, raw_token):
+        """ Подпись токена проверяется один раз, дальше он берется
+            из LRU по отпечатку. Отзыв проверяется на каждый запрос. """
+        validated_token = token_cache.get(raw_token)
+        if validated_token is None:
+            validated_token = super().get_validated_token(raw_token)
+            token_cache.set(raw_token, validated_token)
+        jti = validated_token.get(api_settings.JTI_CLAIM)
+        if revocation_list.is_revoked(jti):
+            raise InvalidToken('Токен отозван')
+        return validated_token
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(
+                _('Token contained no recognizable user identification')
+            )
+        if has_role_claims(validated_token):
+            state = get_token_state(user_id)
+            if state is None:
+                raise AuthenticationFailed(
+                    _('User not found'), code='user_not_found'
+                )
+            version, revoked_at = state
+            if is_revoked_for_user(validated_token, revoked_at):
+                raise InvalidToken('Токен отозван')
+            if validated_token.get('role_version', 0) != version:
+                raise AuthenticationFailed(
+                    'Права пользователя изменились, получите новый токен',
+                    code='role_changed'
+                )
+            return user_from_token(validated_token)
+        user = user_cache.get(user_id)
+        if user is None:
+            raise AuthenticationFailed(
+                _('User not found'), code='user_not_found'
+            )
+        if not user.is_active:
+            raise AuthenticationFailed(
+                _('User is inactive'), code='user_inactive'
+            )
+        if is_revoked_for_user(validated_token, user.tokens_revoked_at):
+            raise InvalidToken('Токен отозван')
+        return user
@@ -0,0 +1,324 @@
+import bisect
+import heapq
+import re
+import sys
+import threading
+import time
+from datetime import timedelta
+from functools import partial
+from itertools import islice
+
+from django.conf import settings
+from django.db import DatabaseError, connections, transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from reviews.models import Category, Genre, Title
+from .metrics import register
+
+WORD = re.compile(r'\w+')
+# Граница диапазона слов с данным префиксом в отсортированном списке.
+MAX_CHAR = chr(sys.maxunicode)
+
+
+def normalize(text):
+    """ Слова текста в нижнем регистре, "ё" не отличается от "е".
+        Одинаковые слова разных названий хранятся одной строкой. """
+    words = WORD.findall(text.casefold().replace('ё', 'е'))
+    return [sys.intern(word) for word in words]
+
+
+class PrefixIndex:
+    """ Записи одного типа в памяти процесса. Список пар (слово, id),
+        отсортированный по слову, находит записи со словом на заданный
+        префикс за O(log n), а записи, отсортированные по рангу, дают
+        первые k совпадений для коротких префиксов, под которые
+        подходит слишком много слов. """
+
+    def __init__(self):
+        self.words = []
+        self.ranked = []
+        self.entries = {}
+
+    def __len__(self):
+        return len(self.entries)
+
+    @staticmethod
+    def entry(pk, name, rank, data):
+        """ Запись: слова одной строкой с пробелом перед каждым
+            словом, ранг с id на конце и данные для ответа. """
+        words = tuple(dict.fromkeys(normalize(name)))
+        return words, (' ' + ' '.join(words), (*rank, pk), data)
+
+    def add(self, pk, name, rank, data):
+        self.remove(pk)
+        words, entry = self.entry(pk, name, rank, data)
+        self.entries[pk] = entry
+        rank = entry[1]
+        for word in words:
+            bisect.insort(self.words, (word, pk))
+        bisect.insort(self.ranked, rank)
+
+    def remove(self, pk):
+        entry = self.entries.pop(pk, None)
+        if entry is None:
+            return
+        text, rank, _ = entry
+        for word in text.split():
+            self.discard(self.words, (word, pk))
+        self.discard(self.ranked, rank)
+
+    @staticmethod
+    def discard(items, item):
+        position = bisect.bisect_left(items, item)
+        if position < len(items) and items[position] == item:
+            del items[position]
+
+    def span(self, prefix):
+        """ Границы слов с этим префиксом в отсортированном списке. """
+        start = bisect.bisect_left(self.words, (prefix,))
+        end = bisect.bisect_left(self.words, (prefix + MAX_CHAR,))
+        return start, end
+
+    def search(self, prefixes, limit):
+        """ Данные первых limit записей по рангу. Кандидаты дает самый
+            избирательный префикс - с самым коротким диапазоном слов,
+            остальные ищутся в строке записи как подстрока ' префикс'. """
+        start, end = min(
+            (self.span(prefix) for prefix in prefixes),
+            key=lambda span: span[1] - span[0],
+        )
+        needles = [' ' + prefix for prefix in prefixes]
+        entries = self.entries
+        if end - start > settings.AUTOCOMPLETE_SCAN_LIMIT:
+            # Совпадений много у каждого префикса, и первые по рангу
+            # находятся быстро. Обход ограничен, чтобы редкое сочетание
+            # частых префиксов не держало блокировку на весь список.
+            found = []
+            scan = islice(self.ranked, settings.AUTOCOMPLETE_MAX_SCAN)
+            for rank in scan:
+                text, _, data = entries[rank[-1]]
+                for needle in needles:
+                    if needle not in text:
+                        break
+                else:
+                    found.append(data)
+                    if len(found) >= limit:
+                        break
+            return found
+        candidates = {pk for _, pk in self.words[start:end]}
+        if len(needles) > 1:
+            # Самый избирательный префикс уже совпал, проверяем все.
+            candidates = [
+                pk for pk in candidates
+                if all(needle in entries[pk][0] for needle in needles)
+            ]
+        best = heapq.nsmallest(limit, (entries[pk][1] for pk in candidates))
+        return [entries[rank[-1]][2] for rank in best]
+
+
+def title_entry(pk, name, year, rating):
+    # Сначала тайтлы с оценками, по убыванию рейтинга.
+    return pk, name, (rating is None, -(rating or 0)), (pk, name, year, rating)
+
+
+def catalog_entry(pk, name, slug):
+    return pk, name, (name.casefold(),), (name, slug)
+
+
+class Autocomplete:
+    """ Подсказки по началу слов в названиях тайтлов, жанров и
+        категорий без запросов к базе. Индекс строится при старте
+        сервера (warm() из wsgi.py) или при первом запросе, записи этого
+        процесса попадают в него через сигналы после фиксации
+        транзакции, а раз в AUTOCOMPLETE_REFRESH_INTERVAL секунд он
+        сверяется с базой: дочитывает тайтлы, измененные в других
+        процессах (по полю modified - его обновляют и правки, и новые
+        отзывы), пересобирает тайтлы, если в базе не те id, и
+        перечитывает жанры и категории - это маленькие таблицы, и
+        пересобираются они, только если строки изменились. """
+
+    models = (('titles', Title), ('genres', Genre), ('categories', Category))
+    # Записи хранятся кортежами, словари собираются только для ответа.
+    fields = {
+        'titles': ('id', 'name', 'year', 'rating'),
+        'genres': ('name', 'slug'),
+        'categories': ('name', 'slug'),
+    }
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.refresh_lock = threading.Lock()
+        self.indexes = None
+        self.catalog = {}
+        self.synced = None
+        self.refreshed = 0
+        self.searches = 0
+        self.rebuilds = 0
+
+    def load(self, name, queryset=None):
+        model = dict(self.models)[name]
+        if queryset is None:
+            queryset = model.objects.all()
+        if model is Title:
+            rows = queryset.values_list('id', 'name', 'year', 'rating')
+            return [title_entry(*row) for row in rows.iterator()]
+        rows = queryset.values_list('id', 'name', 'slug')
+        return [catalog_entry(*row) for row in rows.iterator()]
+
+    def build(self, name, rows=None):
+        """ Новый индекс: пары сортируются один раз, а не вставкой. """
+        index = PrefixIndex()
+        if rows is None:
+            rows = self.load(name)
+        for pk, *row in rows:
+            words, entry = index.entry(pk, *row)
+            index.entries[pk] = entry
+            index.words.extend((word, pk) for word in words)
+            index.ranked.append(entry[1])
+        index.words.sort()
+        index.ranked.sort()
+        return index
+
+    def rebuild(self, names, rows=None):
+        rows = rows or {}
+        indexes = {name: self.build(name, rows.get(name)) for name in names}
+        with self.lock:
+            self.indexes = {**(self.indexes or {}), **indexes}
+        self.rebuilds += 1
+
+    def is_fresh(self):
+        return self.indexes is not None and time.monotonic() - \
+            self.refreshed < settings.AUTOCOMPLETE_REFRESH_INTERVAL
+
+    def refresh(self):
+        if self.is_fresh():
+            return
+        # Пока один поток обновляет индекс, остальные отвечают по
+        # старому; ждать приходится только первой сборки.
+        if not self.refresh_lock.acquire(blocking=self.indexes is None):
+            return
+        try:
+            if self.is_fresh():
+                return
+            synced = timezone.now()
+            catalog = {
+                name: self.load(name) for name in ('genres', 'categories')
+            }
+            if self.indexes is None:
+                self.rebuild(dict(self.models), catalog)
+            else:
+                self.sync_titles()
+                changed = [
+                    name for name, rows in catalog.items()
+                    if rows != self.catalog.get(name)
+                ]
+                if changed:
+                    self.rebuild(changed, catalog)
+            self.catalog, self.synced = catalog, synced
+            self.refreshed = time.monotonic()
+        finally:
+            self.refresh_lock.release()
+
+    def sync_titles(self):
+        # Запас на транзакции, которые записали modified раньше,
+        # а зафиксировались позже прошлой синхронизации.
+        since = self.synced - timedelta(
+            seconds=settings.AUTOCOMPLETE_REFRESH_INTERVAL
+        )
+        changed = self.load(
+            'titles', Title.objects.filter(modified__gte=since)
+        )
+        with self.lock:
+            index = self.indexes['titles']
+            for entry in changed:
+                index.add(*entry)
+            indexed = len(index), sum(index.entries)
+        # Удаление в другом процессе видно по набору id: новые id больше
+        # удаленных, и удаление вместе с созданием меняет сумму, даже
+        # если число тайтлов осталось прежним.
+        stored = Title.objects.aggregate(count=Count('id'), ids=Sum('id'))
+        if (stored['count'], stored['ids'] or 0) != indexed:
+            self.rebuild(('titles',))
+
+    def search(self, text, limit):
+        self.refresh()
+        self.searches += 1
+        prefixes = normalize(text)
+        result = {}
+        for name, _ in self.models:
+            with self.lock:
+                found = (
+                    self.indexes[name].search(prefixes, limit)
+                    if prefixes else []
+                )
+            result[name] = [dict(zip(self.fields[name], row)) for row in found]
+        return result
+
+    def warm(self):
+        """ Собирает индекс в фоне, чтобы первый запрос подсказок не
+            ждал чтения всех тайтлов. """
+        thread = threading.Thread(target=self.warm_up, daemon=True)
+        thread.start()
+        return thread
+
+    def warm_up(self):
+        try:
+            self.refresh()
+        except DatabaseError:
+            # Например, база еще не мигрирована: индекс соберет первый
+            # запрос подсказок.
+            pass
+        finally:
+            connections.close_all()
+
+    @staticmethod
+    def index_name(instance):
+        return {Title: 'titles', Genre: 'genres', Category: 'categories'}[
+            type(instance)
+        ]
+
+    def update(self, instance, using=None):
+        """ Запись попадает в индекс только после фиксации транзакции:
+            откаченный жанр не должен остаться в подсказках. Значения
+            берутся сейчас, пока экземпляр не изменился. """
+        if isinstance(instance, Title):
+            entry = title_entry(instance.pk, instance.name, instance.year,
+                                instance.rating)
+        else:
+            entry = catalog_entry(instance.pk, instance.name, instance.slug)
+        transaction.on_commit(
+            partial(self.apply, self.index_name(instance), 'add', *entry),
+            using=using
+        )
+
+    def remove(self, instance, using=None):
+        # После delete() у экземпляра уже нет pk, поэтому он берется здесь.
+        transaction.on_commit(
+            partial(self.apply, self.index_name(instance), 'remove',
+                    instance.pk),
+            using=using
+        )
+
+    def apply(self, name, method, *args):
+        if self.indexes is None:
+            return
+        with self.lock:
+            getattr(self.indexes[name], method)(*args)
+
+    def reset(self):
+        with self.lock:
+            self.indexes = None
+            self.catalog = {}
+
+    def stats(self):
+        indexes = self.indexes or {}
+        return {
+            'searches': self.searches,
+            'rebuilds': self.rebuilds,
+            **{name: len(index) for name, index in indexes.items()},
+        }
+
+
+autocomplete = Autocomplete()
+register('autocomplete')(autocomplete.stats)
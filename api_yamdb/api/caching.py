@@ -0,0 +1,61 @@
+import hashlib
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+VERSION_KEY = 'api:version:{}'
+
+
+def version_key(model):
+    return VERSION_KEY.format(model._meta.label_lower)
+
+
+def get_versions(models):
+    """ Текущие счетчики версий моделей. Любая запись в модель
+        увеличивает ее счетчик, поэтому ключи кэша со старой версией
+        просто перестают запрашиваться - инвалидация за O(1). """
+    keys = [version_key(model) for model in models]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            # Начинаем не с нуля, чтобы после вытеснения счетчика
+            # из кэша не попасть на записи со старой версией.
+            cache.add(key, int(time.time() * 1000), timeout=None)
+            versions[key] = cache.get(key)
+    return tuple(versions[key] for key in keys)
+
+
+def bump_version(model):
+    key = version_key(model)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, int(time.time() * 1000), timeout=None)
+
+
+def bump_version_on_commit(model, using=None):
+    """ Версия меняется только после фиксации транзакции. Иначе
+        параллельный запрос прочитает новую версию, но старые строки
+        и положит их в кэш под новым ключом на весь срок хранения. """
+    transaction.on_commit(lambda: bump_version(model), using=using)
+
+
+def make_digest(*parts):
+    return hashlib.md5(repr(parts).encode('utf-8')).hexdigest()
+
+
+def make_key(prefix, *parts):
+    return f'api:{prefix}:{make_digest(*parts)}'
+
+
+def normalize_query(query_params, exclude=()):
+    """ Параметры запроса в каноническом виде: без служебных
+        параметров и отсортированные по имени. Значения повторенного
+        параметра остаются в исходном порядке: DRF берет последнее,
+        и ?ordering=year&ordering=-year - это другой ответ. """
+    return tuple(
+        (name, tuple(query_params.getlist(name)))
+        for name in sorted(query_params)
+        if name not in exclude
+    )
@@ -1,18 +1,172 @@
+from django.db import connections, router
+from django.db.models import Count, F
+from django.db.models.expressions import OrderBy
 from django_filters import rest_framework as filters
+from rest_framework.filters import BaseFilterBackend, OrderingFilter
+from rest_framework.settings import api_settings
 
+from reviews.fts import fts_available, fts_table, match_expression
 from reviews.models import Title
+from .lookups import category_slugs, genre_slugs
+
+
+class SlugListFilter(filters.BaseCSVFilter, filters.CharFilter):
+    """ Список slug через запятую: ?genre__in=drama,comedy. """
 
 
 class TitleFilter(filters.FilterSet):
     """ Создаем фильтр для тайтлов. """
 
-    category = filters.CharFilter(
-        field_name='category__slug',
-        lookup_expr='iexact'
-    )
-    genre = filters.CharFilter(field_name='genre__slug', lookup_expr='iexact')
+    category = filters.CharFilter(method='filter_category')
+    category__in = SlugListFilter(method='filter_category_in')
+    genre = filters.CharFilter(method='filter_genre')
+    genre__in = SlugListFilter(method='filter_genre_in')
+    genre__all = SlugListFilter(method='filter_genre_all')
     name = filters.CharFilter(field_name='name', lookup_expr='icontains')
+    rating_min = filters.NumberFilter(field_name='rating', lookup_expr='gte')
+    rating_max = filters.NumberFilter(field_name='rating', lookup_expr='lte')
+    year_min = filters.NumberFilter(field_name='year', lookup_expr='gte')
+    year_max = filters.NumberFilter(field_name='year', lookup_expr='lte')
 
     class Meta:
         model = Title
         fields = ['category', 'name', 'year', 'genre']
+
+    # Slug переводится в id по таблице в памяти, и фильтр идет по
+    # внешнему ключу без JOIN на категории и жанры.
+    def filter_category(self, queryset, name, value):
+        pk = category_slugs.get_id(value)
+        if pk is None:
+            return queryset.none()
+        return queryset.filter(category_id=pk)
+
+    def filter_category_in(self, queryset, name, value):
+        """ Тайтлы любой из категорий. """
+        ids = category_slugs.get_ids(value)
+        if not ids:
+            return queryset.none()
+        return queryset.filter(category_id__in=ids)
+
+    def filter_genre(self, queryset, name, value):
+        """ Полусоединение id IN (SELECT title_id ...) вместо JOIN:
+            строки тайтлов не размножаются, DISTINCT не нужен, а SQLite
+            идет от индекса genre_id таблицы связей, а не проверяет
+            каждый тайтл, как сделал бы коррелированный EXISTS. """
+        pk = genre_slugs.get_id(value)
+        if pk is None:
+            return queryset.none()
+        links = Title.genre.through.objects.filter(genre_id=pk)
+        return queryset.filter(pk__in=links.values('title_id'))
+
+    def filter_genre_in(self, queryset, name, value):
+        """ Тайтлы хотя бы с одним из жанров - тот же подзапрос
+            со списком id, тайтл с двумя жанрами из списка попадает
+            в выборку один раз. """
+        ids = genre_slugs.get_ids(value)
+        if not ids:
+            return queryset.none()
+        links = Title.genre.through.objects.filter(genre_id__in=ids)
+        return queryset.filter(pk__in=links.values('title_id'))
+
+    def filter_genre_all(self, queryset, name, value):
+        """ Тайтлы со всеми жанрами списка: связи с этими жанрами
+            группируются по тайтлу, и остаются тайтлы, у которых их
+            столько же, сколько жанров в списке. """
+        slugs = {slug.lower() for slug in value}
+        ids = genre_slugs.get_ids(slugs)
+        if not ids or len(ids) < len(slugs):
+            return queryset.none()
+        links = Title.genre.through.objects.filter(
+            genre_id__in=ids
+        ).values('title_id').annotate(
+            matched=Count('genre_id')
+        ).filter(matched=len(ids)).values('title_id')
+        return queryset.filter(pk__in=links)
+
+
+class NullsLast(OrderBy):
+    """ ORDER BY ... NULLS LAST. Django 2.2 эмулирует его на SQLite
+        через "rating IS NULL", и сортировка перестает идти по индексу;
+        сам синтаксис SQLite понимает с версии 3.30. """
+
+    def __init__(self, expression, descending=False):
+        super().__init__(expression, descending=descending, nulls_last=True)
+
+    def as_sqlite(self, compiler, connection):
+        if connection.Database.sqlite_version_info >= (3, 30):
+            return self.as_sql(compiler, connection)
+        return super().as_sqlite(compiler, connection)
+
+
+class TitleOrderingFilter(OrderingFilter):
+    """ Сортировка тайтлов с досортировкой по id в направлении
+        первого поля, чтобы страницы не перемешивались на равных
+        значениях и выборка шла по индексу (rating, id). Тайтлы без
+        рейтинга идут последними в обоих направлениях на любой базе:
+        SQLite и PostgreSQL по умолчанию ставят NULL на разные концы. """
+    nulls_last_fields = ('rating',)
+
+    def get_ordering(self, request, queryset, view):
+        ordering = list(super().get_ordering(request, queryset, view) or [])
+        if ordering and not {'id', '-id'} & set(ordering):
+            ordering.append('-id' if ordering[0].startswith('-') else 'id')
+        return [self.nulls_last(field) for field in ordering]
+
+    def nulls_last(self, field):
+        name = field.lstrip('-')
+        if name not in self.nulls_last_fields:
+            return field
+        return NullsLast(F(name), descending=field.startswith('-'))
+
+
+class TitleSearchFilter(BaseFilterBackend):
+    """ Поиск ?search= по названию и описанию тайтла. На SQLite идет
+        по индексу FTS5 и без ?ordering= сортирует по релевантности
+        (bm25, совпадение в названии весит больше), на остальных базах
+        работает как фильтр name. """
+    search_param = 'search'
+    # Веса столбцов name и description для bm25.
+    weights = (10.0, 1.0)
+
+    def filter_queryset(self, request, queryset, view):
+        text = request.query_params.get(self.search_param, '')
+        query = match_expression(text)
+        if query is None:
+            return queryset
+        table = queryset.model._meta.db_table
+        connection = connections[router.db_for_read(queryset.model)]
+        if not fts_available(connection, table):
+            return queryset.filter(name__icontains=text.strip())
+        fts = fts_table(table)
+        weights = ', '.join(str(weight) for weight in self.weights)
+        queryset = queryset.extra(
+            select={'search_rank': f'bm25({fts}, {weights})'},
+            tables=[fts],
+            where=[f'{fts}.rowid = {table}.id', f'{fts} MATCH %s'],
+            params=[query],
+        )
+        if api_settings.ORDERING_PARAM in request.query_params:
+            return queryset
+        return queryset.order_by('search_rank', 'id')
+
+
+def text_search(queryset, text, snippet_tokens=12):
+    """ Отбирает строки с полем text, в которых есть все слова запроса,
+        и добавляет к ним search_snippet - фрагмент текста вокруг
+        совпадений. Возвращает выборку и столбец, по которому ее можно
+        листать от новых строк к старым. """
+    table = queryset.model._meta.db_table
+    connection = connections[router.db_for_read(queryset.model)]
+    if not fts_available(connection, table):
+        return queryset.filter(text__icontains=text.strip()), f'{table}.id'
+    fts = fts_table(table)
+    queryset = queryset.extra(
+        select={
+            'search_snippet':
+                f"snippet({fts}, 0, '**', '**', '…', {snippet_tokens})",
+        },
+        tables=[fts],
+        where=[f'{fts}.rowid = {table}.id', f'{fts} MATCH %s'],
+        params=[match_expression(text)],
+    )
+    return queryset, f'{fts}.rowid'
@@ -0,0 +1,114 @@
+import threading
+import time
+
+from django.conf import settings
+from django.db import router
+from django.db.models import IntegerField, Value
+
+from reviews.models import Category, Genre
+from .caching import get_versions
+
+
+class SlugLookup:
+    """ Таблица slug -> id маленькой и почти не меняющейся модели,
+        которая держится в памяти процесса. Таблица перечитывается,
+        когда меняется версия модели (любой save/delete), раз в
+        SLUG_LOOKUP_TIMEOUT секунд и при промахе, но не чаще раза
+        в SLUG_LOOKUP_MISS_INTERVAL секунд - на случай записи из
+        другого процесса. """
+
+    def __init__(self, model):
+        self.model = model
+        self.lock = threading.Lock()
+        self.version = None
+        self.loaded = None
+        self.missed = None
+        self.ids = {}
+
+    def __deepcopy__(self, memo):
+        # Поля сериализаторов копируются на каждый запрос, а таблица
+        # должна оставаться общей для процесса.
+        return self
+
+    def get_id(self, slug):
+        """ id по slug или None. slug в базе хранятся в нижнем
+            регистре, поэтому и искомый приводится к нему. """
+        ids = self.get_ids((slug,))
+        return ids[0] if ids else None
+
+    def get_ids(self, slugs):
+        """ id известных slug из списка, неизвестные пропускаются.
+            Сколько бы slug ни оказалось неизвестными, таблица
+            перечитывается не больше одного раза. """
+        slugs = [slug.lower() for slug in slugs]
+        ids = self.load()
+        if any(slug not in ids for slug in slugs):
+            ids = self.load_on_miss()
+        return [ids[slug] for slug in slugs if slug in ids]
+
+    def get_instance(self, slug):
+        """ Объект модели только с id и slug - его достаточно, чтобы
+            присвоить внешний ключ или добавить связь many-to-many. """
+        pk = self.get_id(slug)
+        if pk is None:
+            return None
+        instance = self.model(pk=pk, slug=slug.lower())
+        instance._state.adding = False
+        instance._state.db = router.db_for_write(self.model)
+        return instance
+
+    def primary(self):
+        """ Таблица сверяется с версией модели, поэтому читается
+            с основной базы, а не с отстающей реплики. """
+        return self.model.objects.using(router.db_for_write(self.model))
+
+    def load_on_miss(self):
+        now = time.monotonic()
+        if self.missed is not None and \
+                now - self.missed < settings.SLUG_LOOKUP_MISS_INTERVAL:
+            return self.ids
+        self.missed = now
+        return self.load(force=True)
+
+    def load(self, force=False):
+        version = get_versions((self.model,))
+        expired = self.loaded is None or \
+            time.monotonic() - self.loaded >= settings.SLUG_LOOKUP_TIMEOUT
+        if not force and not expired and version == self.version:
+            return self.ids
+        with self.lock:
+            ids = dict(self.primary().values_list('slug', 'id'))
+            self.ids = ids
+            self.version = version
+            self.loaded = time.monotonic()
+        return ids
+
+
+def verify_ids(checks):
+    """ Проверяет одним запросом UNION ALL, что записи с этими id еще
+        есть. checks - пары (таблица SlugLookup, id). Удаление в другом
+        процессе таблица может не заметить, а внешний ключ на удаленную
+        запись не даст сохранить тайтл. Возвращает таблицы, в которых
+        каких-то записей нет; они перечитываются. """
+    checks = [(lookup, set(ids)) for lookup, ids in checks if ids]
+    if not checks:
+        return []
+    queries = [
+        lookup.primary().filter(pk__in=ids).annotate(
+            lookup=Value(number, IntegerField())
+        ).order_by().values_list('pk', 'lookup')
+        for number, (lookup, ids) in enumerate(checks)
+    ]
+    found = [set() for _ in checks]
+    for pk, number in queries[0].union(*queries[1:], all=True):
+        found[number].add(pk)
+    stale = [
+        lookup for (lookup, ids), pks in zip(checks, found) if pks != ids
+    ]
+    for lookup in stale:
+        lookup.load(force=True)
+    return stale
+
+
+category_slugs = SlugLookup(Category)
+genre_slugs = SlugLookup(Genre)
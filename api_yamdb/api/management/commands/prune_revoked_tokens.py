@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from api.revocation import prune_revoked_tokens
+
+
+class Command(BaseCommand):
+    """ Удаляем отозванные токены, срок действия которых истек. """
+
+    help = 'Удаляет истекшие записи об отозванных токенах.'
+
+    def handle(self, *args, **options):
+        deleted = prune_revoked_tokens()
+        self.stdout.write(self.style.SUCCESS(f'Удалено записей: {deleted}'))
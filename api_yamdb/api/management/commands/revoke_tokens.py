@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from reviews.models import User
+
+
+class Command(BaseCommand):
+    """ Отзываем все токены пользователей, например при утечке. """
+
+    help = 'Отзывает все выписанные пользователям токены.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('usernames', nargs='+')
+
+    def handle(self, *args, **options):
+        usernames = options['usernames']
+        users = list(User.objects.filter(username__in=usernames))
+        missing = set(usernames) - {user.username for user in users}
+        if missing:
+            raise CommandError(
+                f'Нет пользователей: {", ".join(sorted(missing))}'
+            )
+        for user in users:
+            user.revoke_tokens()
+        self.stdout.write(
+            self.style.SUCCESS(f'Отозваны токены пользователей: {len(users)}')
+        )
@@ -0,0 +1,46 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.outbox import deliver_outbox
+
+
+class Command(BaseCommand):
+    """ Обработчик очереди писем: отправляет пачки через одно
+        соединение с почтовым сервером и откладывает упавшие письма
+        с растущей задержкой. """
+
+    help = 'Отправляет письма из очереди OutboxEmail.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=100,
+            help='Сколько писем отправлять через одно соединение.',
+        )
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Не завершаться, а опрашивать очередь.',
+        )
+        parser.add_argument(
+            '--interval', type=float, default=1.0,
+            help='Пауза между опросами пустой очереди, секунд.',
+        )
+
+    def handle(self, *args, **options):
+        total_sent = total_failed = 0
+        while True:
+            sent, failed = deliver_outbox(options['batch_size'])
+            total_sent += sent
+            total_failed += failed
+            if sent or failed:
+                self.stdout.write(
+                    f'Отправлено {sent}, отложено {failed}'
+                )
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Очередь пуста: отправлено {total_sent}, '
+            f'отложено {total_failed}'
+        ))
@@ -0,0 +1,13 @@
+_collectors = {}
+
+
+def register(name):
+    """ Регистрирует функцию, которая отдает раздел /api/v1/metrics/. """
+    def decorator(collect):
+        _collectors[name] = collect
+        return collect
+    return decorator
+
+
+def collect():
+    return {name: collect() for name, collect in _collectors.items()}
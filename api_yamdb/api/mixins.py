@@ -0,0 +1,142 @@
+import time
+from calendar import timegm
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+from rest_framework.response import Response
+
+from .caching import get_versions, make_digest, make_key, normalize_query
+from .replicas import read_from_replica
+
+
+class AnonymousResponseCacheMixin:
+    """ Кэш ответов на анонимные GET запросы. Ключ - хост, путь,
+        нормализованная строка запроса, формат ответа и версии моделей
+        из response_cache_models, так что после записи в любую из них
+        старые ответы больше не читаются. Вместе с данными хранятся
+        ETag и Last-Modified, и условный запрос получает 304 прямо
+        из кэша. """
+    response_cache_models = ()
+    response_cache_headers = ('ETag', 'Last-Modified')
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        if request.user.is_authenticated:
+            return handler(request, *args, **kwargs)
+        key = make_key(
+            'response',
+            request.get_host(),
+            request.path,
+            normalize_query(request.query_params),
+            request.accepted_media_type,
+            get_versions(self.response_cache_models),
+        )
+        cached = cache.get(key)
+        if cached is not None:
+            data, headers = cached
+            last_modified = headers.get('Last-Modified')
+            response = get_conditional_response(
+                request._request,
+                etag=headers.get('ETag'),
+                last_modified=(
+                    parse_http_date_safe(last_modified)
+                    if last_modified else None
+                ),
+            ) or Response(data)
+            for name, value in headers.items():
+                response[name] = value
+            return response
+        response = handler(request, *args, **kwargs)
+        # Ответ с отстающей реплики не должен лечь под новую версию.
+        if response.status_code == 200 and read_from_replica.get() is None:
+            headers = {
+                name: response[name] for name in self.response_cache_headers
+                if response.has_header(name)
+            }
+            cache.set(
+                key, (response.data, headers), settings.RESPONSE_CACHE_TIMEOUT
+            )
+        return response
+
+
+class AnonymousDetailCacheMixin(AnonymousResponseCacheMixin):
+    """ То же для ответов о конкретном объекте. """
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+
+class ConditionalGetMixin:
+    """ ETag и Last-Modified для GET запросов. Штамп версии берется
+        дешевым запросом в get_version_stamp(), и на совпадающие
+        If-None-Match/If-Modified-Since отдается 304 до основного
+        запроса и сериализатора. """
+
+    def get_version_stamp(self):
+        """ Возвращает пару (версия, время изменения или None) либо
+            None, если условный ответ невозможен. По умолчанию - одним
+            агрегатом по выборке: число объектов и самое позднее
+            modified; без поля modified условных ответов нет. """
+        queryset = self.filter_queryset(self.get_queryset())
+        try:
+            queryset.model._meta.get_field('modified')
+        except FieldDoesNotExist:
+            return None
+        lookup = self.lookup_url_kwarg or self.lookup_field
+        if lookup in self.kwargs:
+            queryset = queryset.filter(
+                **{self.lookup_field: self.kwargs[lookup]}
+            )
+        stamp = queryset.aggregate(count=Count('pk'), modified=Max('modified'))
+        if not stamp['count']:
+            return None
+        return (stamp['count'], stamp['modified']), stamp['modified']
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+    def conditional_response(self, handler, request, *args, **kwargs):
+        stamp = self.get_version_stamp()
+        if stamp is None:
+            return handler(request, *args, **kwargs)
+        version, modified = stamp
+        etag = '"{}"'.format(make_digest(
+            request.path,
+            normalize_query(request.query_params),
+            request.accepted_media_type,
+            version,
+        ))
+        last_modified = (
+            timegm(modified.utctimetuple()) if modified is not None else None
+        )
+        if last_modified is not None and last_modified >= int(time.time()):
+            # Last-Modified точен до секунды: запись в ту же секунду его
+            # не сменит, и If-Modified-Since получил бы 304 на старые
+            # данные. Такой ответ отдается только с ETag.
+            last_modified = None
+        response = get_conditional_response(
+            request._request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        return response
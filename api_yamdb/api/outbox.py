@@ -0,0 +1,112 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import connection, transaction
+from django.utils import timezone
+
+from reviews.models import OutboxEmail
+from .metrics import register
+
+
+def enqueue_email(subject, body, to, from_email=None):
+    """ Кладет письмо в очередь. Вызывается внутри транзакции, которая
+        меняет данные: письмо уйдет, только если она зафиксирована. """
+    return OutboxEmail.objects.create(
+        subject=subject,
+        body=body,
+        from_email=from_email or settings.SITE_EMAIL,
+        to=to,
+    )
+
+
+def retry_delay(attempts):
+    """ Экспоненциальная задержка перед следующей попыткой. """
+    delay = settings.OUTBOX_RETRY_DELAY * 2 ** (attempts - 1)
+    return timedelta(seconds=min(delay, settings.OUTBOX_MAX_RETRY_DELAY))
+
+
+def claim_batch(batch_size, now):
+    """ Забираем пачку писем и откладываем их на время аренды, чтобы
+        параллельный обработчик не отправил их второй раз. """
+    lease = now + timedelta(seconds=settings.OUTBOX_LEASE)
+    with transaction.atomic():
+        due = OutboxEmail.objects.due(now)
+        if connection.features.has_select_for_update_skip_locked:
+            due = due.select_for_update(skip_locked=True)
+        emails = list(due[:batch_size])
+        OutboxEmail.objects.filter(
+            pk__in=[email.pk for email in emails]
+        ).update(next_attempt_at=lease)
+    return emails
+
+
+def send_batch(emails, mail_connection):
+    """ Отправляем пачку через одно открытое соединение. Письма
+        уходят по одному, чтобы упавшее письмо не тянуло за собой
+        повторную отправку уже ушедших. Возвращает словарь
+        id -> текст ошибки для неотправленных. """
+    errors = {}
+    for email in emails:
+        message = EmailMessage(email.subject, email.body, email.from_email,
+                               [email.to], connection=mail_connection)
+        try:
+            mail_connection.send_messages([message])
+        except Exception as error:
+            errors[email.pk] = repr(error)
+    return errors
+
+
+def deliver_outbox(batch_size=100, mail_connection=None):
+    """ Отправляет письма, время которых наступило.
+        Возвращает пару (отправлено, не отправлено). """
+    now = timezone.now()
+    emails = claim_batch(batch_size, now)
+    if not emails:
+        return 0, 0
+    mail_connection = mail_connection or get_connection()
+    try:
+        mail_connection.open()
+    except Exception as error:
+        # Сервер недоступен: вся пачка откладывается, как если бы
+        # упало каждое письмо, а обработчик с --loop не падает.
+        errors = dict.fromkeys([email.pk for email in emails], repr(error))
+    else:
+        try:
+            errors = send_batch(emails, mail_connection)
+        finally:
+            mail_connection.close()
+    sent = [email.pk for email in emails if email.pk not in errors]
+    OutboxEmail.objects.filter(pk__in=sent).update(
+        sent_at=timezone.now(), last_error=''
+    )
+    for email in emails:
+        if email.pk not in errors:
+            continue
+        attempts = email.attempts + 1
+        next_attempt_at = None
+        if attempts < settings.OUTBOX_MAX_ATTEMPTS:
+            next_attempt_at = now + retry_delay(attempts)
+        OutboxEmail.objects.filter(pk=email.pk).update(
+            attempts=attempts,
+            next_attempt_at=next_attempt_at,
+            last_error=errors[email.pk],
+        )
+    return len(sent), len(errors)
+
+
+@register('outbox')
+def outbox_stats():
+    """ Глубина очереди для /api/v1/metrics/. """
+    now = timezone.now()
+    oldest = OutboxEmail.objects.pending().order_by('created').values_list(
+        'created', flat=True
+    ).first()
+    return {
+        'pending': OutboxEmail.objects.pending().count(),
+        'due': OutboxEmail.objects.due(now).count(),
+        'failed': OutboxEmail.objects.failed().count(),
+        'oldest_pending_age': (
+            round((now - oldest).total_seconds(), 3) if oldest else 0
+        ),
+    }
@@ -0,0 +1,245 @@
+import json
+from base64 import b64decode, b64encode
+from binascii import Error as BinasciiError
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+from .caching import get_versions, make_key, normalize_query
+from .replicas import read_from_replica
+
+
+class CachedCountPaginator(Paginator):
+    """ Paginator, который берет COUNT(*) из кэша, а для больших
+        таблиц без фильтров может отдать оценку вместо точного числа. """
+
+    def __init__(self, object_list, per_page, cache_key=None,
+                 estimate_threshold=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.cache_key = cache_key
+        self.estimate_threshold = estimate_threshold
+
+    @cached_property
+    def count(self):
+        if self.cache_key is None:
+            return self.get_count()
+        count = cache.get(self.cache_key)
+        if count is None:
+            count = self.get_count()
+            # Счетчик с отстающей реплики не кэшируется под новой версией.
+            if read_from_replica.get() is None:
+                cache.set(self.cache_key, count,
+                          settings.PAGINATION_COUNT_CACHE_TIMEOUT)
+        return count
+
+    def get_count(self):
+        if self.estimate_threshold is not None:
+            estimate = self.estimate_count()
+            if estimate is not None and estimate >= self.estimate_threshold:
+                return estimate
+        return self.object_list.count()
+
+    def estimate_count(self):
+        """ Оценка числа строк без полного прохода по таблице из
+            статистики планировщика: pg_class в PostgreSQL, sqlite_stat1
+            (ее собирает ANALYZE) в SQLite. Годится только для выборки
+            без условий; нет статистики - считаем точно. """
+        queryset = self.object_list
+        if queryset.query.where or queryset.query.distinct:
+            return None
+        connection = connections[queryset.db]
+        table = queryset.model._meta.db_table
+        if connection.vendor == 'postgresql':
+            sql = 'SELECT reltuples::bigint FROM pg_class WHERE relname = %s'
+        elif connection.vendor == 'sqlite':
+            sql = 'SELECT stat FROM sqlite_stat1 WHERE tbl = %s'
+        else:
+            return None
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(sql, [table])
+                row = cursor.fetchone()
+        except DatabaseError:
+            # В SQLite таблицы sqlite_stat1 нет до первого ANALYZE.
+            return None
+        if row is None or row[0] is None:
+            return None
+        # В sqlite_stat1 первое число поля stat - количество строк.
+        estimate = int(str(row[0]).split()[0])
+        return estimate if estimate >= 0 else None
+
+
+class CachedCountPagination(PageNumberPagination):
+    """ Постраничная пагинация с кэшем COUNT(*) по эндпоинту и
+        нормализованным параметрам фильтрации. Ключ включает версии
+        моделей из view.count_cache_models (по умолчанию - модель
+        queryset), поэтому любая запись в них сбрасывает счетчик. """
+    ignored_query_params = ('page', 'page_size', 'ordering', 'cursor')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.django_paginator_class = partial(
+            CachedCountPaginator,
+            cache_key=self.get_count_cache_key(queryset, request, view),
+            estimate_threshold=settings.PAGINATION_ESTIMATED_COUNT_THRESHOLD,
+        )
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_count_cache_key(self, queryset, request, view):
+        models = getattr(view, 'count_cache_models', None) or (queryset.model,)
+        return make_key(
+            'count',
+            request.path,
+            normalize_query(request.query_params, self.ignored_query_params),
+            get_versions(models),
+        )
+
+
+class KeysetPagination(BasePagination):
+    """ Пагинация по ключу (pub_date, id) от новых записей к старым.
+        Страница выбирается условием по ключу вместо OFFSET и без
+        COUNT(*), поэтому глубокие страницы стоят столько же,
+        сколько первая. """
+    cursor_query_param = 'cursor'
+    page_size = api_settings.PAGE_SIZE
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.base_url = request.build_absolute_uri()
+        position, self.reverse = self.decode_cursor(request)
+
+        if self.reverse:
+            queryset = queryset.order_by('pub_date', 'id')
+        else:
+            queryset = queryset.order_by('-pub_date', '-id')
+        if position is not None:
+            pub_date, pk = position
+            if self.reverse:
+                queryset = queryset.filter(
+                    Q(pub_date__gt=pub_date) | Q(pub_date=pub_date, id__gt=pk)
+                )
+            else:
+                queryset = queryset.filter(
+                    Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, id__lt=pk)
+                )
+
+        return self.fetch_page(queryset, position)
+
+    def fetch_page(self, queryset, position):
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        if self.reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+        return self.page
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def encode_cursor(self, obj, reverse):
+        payload = json.dumps([obj.pub_date.isoformat(), obj.pk, reverse])
+        cursor = b64encode(payload.encode('ascii')).decode('ascii')
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, cursor
+        )
+
+    def decode_cursor(self, request):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None, False
+        try:
+            payload = b64decode(cursor.encode('ascii'))
+            pub_date, pk, reverse = json.loads(payload)
+            pub_date = parse_datetime(pub_date)
+        except (TypeError, ValueError, UnicodeError, BinasciiError):
+            raise NotFound(self.invalid_cursor_message)
+        if pub_date is None or not isinstance(pk, int):
+            raise NotFound(self.invalid_cursor_message)
+        return (pub_date, pk), bool(reverse)
+
+
+class RowidKeysetPagination(KeysetPagination):
+    """ Пагинация по id от новых записей к старым для выдачи поиска.
+        Ключ - столбец view.keyset_column: для поиска по FTS5 это rowid
+        индекса, в порядке которого SQLite и так отдает совпадения,
+        поэтому страница читается без сортировки всех найденных строк. """
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.base_url = request.build_absolute_uri()
+        position, self.reverse = self.decode_cursor(request)
+        column = view.keyset_column
+        where, params = [], []
+        if position is not None:
+            where.append(f'{column} {">" if self.reverse else "<"} %s')
+            params.append(position)
+        queryset = queryset.extra(
+            where=where, params=params,
+            order_by=[column if self.reverse else f'-{column}'],
+        )
+        return self.fetch_page(queryset, position)
+
+    def encode_cursor(self, obj, reverse):
+        payload = json.dumps([obj.pk, reverse])
+        cursor = b64encode(payload.encode('ascii')).decode('ascii')
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, cursor
+        )
+
+    def decode_cursor(self, request):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None, False
+        try:
+            payload = b64decode(cursor.encode('ascii'))
+            pk, reverse = json.loads(payload)
+        except (TypeError, ValueError, UnicodeError, BinasciiError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(pk, int):
+            raise NotFound(self.invalid_cursor_message)
+        return pk, bool(reverse)
+
+
+class PageNumberOrKeysetPagination(CachedCountPagination):
+    """ Постраничная пагинация по умолчанию; с параметром ?cursor=
+        (в том числе пустым) - пагинация по ключу (pub_date, id). """
+    keyset_pagination_class = KeysetPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        cursor_param = self.keyset_pagination_class.cursor_query_param
+        if cursor_param in request.query_params:
+            self.keyset = self.keyset_pagination_class()
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
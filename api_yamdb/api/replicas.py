@@ -0,0 +1,107 @@
+import contextvars
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from rest_framework.permissions import SAFE_METHODS
+
+from .caching import make_key
+
+# Реплика, выбранная для текущего запроса, или None - читать с основной
+# базы. Кэши в памяти и в cache, которые сверяются с версиями моделей,
+# не заполняются данными с реплики: она может отставать от версии.
+read_from_replica = contextvars.ContextVar('read_from_replica', default=None)
+
+
+class WeightedRoundRobin:
+    """ Плавный взвешенный round-robin (как в nginx): реплика с весом 2
+        получает вдвое больше чтений, и чтения не идут пачками. """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.weights = None
+        self.current = {}
+
+    def choose(self, weights):
+        with self.lock:
+            if weights != self.weights:
+                self.weights = dict(weights)
+                self.current = dict.fromkeys(weights, 0)
+            total = sum(weights.values())
+            for alias, weight in weights.items():
+                self.current[alias] += weight
+            alias = max(self.current, key=self.current.get)
+            self.current[alias] -= total
+        return alias
+
+
+balancer = WeightedRoundRobin()
+
+
+class ReplicaRouter:
+    """ Чтения внутри ReplicaReadMixin идут на реплику, выбранную
+        для запроса, все остальное - на основную базу. Выбор не
+        меняется от вызова к вызову, поэтому проверки вроде
+        fts_available() смотрят на ту же базу, что и сам запрос. """
+
+    def db_for_read(self, model, **hints):
+        alias = read_from_replica.get()
+        if alias is None or alias not in settings.DATABASE_REPLICAS:
+            return None
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            # Внутри транзакции читаем то, что в ней записано.
+            return None
+        return alias
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики содержат те же данные, что и основная база.
+        return True
+
+
+def sticky_key(request):
+    """ Клиент - это его токен, а без токена - его IP. """
+    return make_key(
+        'sticky',
+        request.META.get('HTTP_AUTHORIZATION')
+        or request.META.get('REMOTE_ADDR'),
+    )
+
+
+class ReplicaReadMixin:
+    """ Безопасные запросы к вьюсету читают с реплик. Аутентификация
+        идет по основной базе: только что созданный пользователь может
+        еще не доехать до реплики. После записи клиент
+        REPLICA_STICKY_SECONDS секунд читает с основной базы, чтобы
+        видеть свои изменения до того, как их получит реплика. Реплика
+        выбирается один раз на запрос. """
+
+    def dispatch(self, request, *args, **kwargs):
+        self.replica_token = None
+        try:
+            response = super().dispatch(request, *args, **kwargs)
+        finally:
+            if self.replica_token is not None:
+                read_from_replica.reset(self.replica_token)
+        if settings.DATABASE_REPLICAS \
+                and request.method not in SAFE_METHODS \
+                and response.status_code < 400:
+            # Неудачная запись ничего не изменила, а удачная станет
+            # видна другим только после фиксации транзакции.
+            key = sticky_key(request)
+            transaction.on_commit(lambda: cache.set(
+                key, True, settings.REPLICA_STICKY_SECONDS
+            ))
+        return response
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if settings.DATABASE_REPLICAS \
+                and request.method in SAFE_METHODS \
+                and not cache.get(sticky_key(request)):
+            self.replica_token = read_from_replica.set(
+                balancer.choose(settings.DATABASE_REPLICAS)
+            )
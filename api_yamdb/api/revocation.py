@@ -0,0 +1,151 @@
+import hashlib
+import math
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework_simplejwt.settings import api_settings
+
+from reviews.models import RevokedToken
+from .metrics import register
+
+
+class BloomFilter:
+    """ Множество без ложноотрицательных ответов: если jti нет
+        в фильтре, его точно нет и в таблице. """
+
+    def __init__(self, capacity, error_rate):
+        self.capacity = capacity
+        self.size = max(8, int(
+            -capacity * math.log(error_rate) / math.log(2) ** 2
+        ))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def positions(self, value):
+        digest = hashlib.sha256(value.encode()).digest()
+        first = int.from_bytes(digest[:8], 'big')
+        second = int.from_bytes(digest[8:16], 'big') | 1
+        for number in range(self.hashes):
+            yield (first + number * second) % self.size
+
+    def add(self, value):
+        for position in self.positions(value):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, value):
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7))
+            for position in self.positions(value)
+        )
+
+
+class RevocationList:
+    """ Отозванные токены для проверки на каждый запрос. Фильтр Блума
+        в памяти процесса раз в REVOCATION_REFRESH_INTERVAL секунд
+        дочитывает новые строки RevokedToken по id, поэтому частый
+        ответ "не отозван" обходится без запросов; в таблицу идут
+        только срабатывания фильтра. """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.bloom = None
+        self.last_id = 0
+        self.refreshed = 0
+        self.checks = 0
+        self.bloom_positives = 0
+        self.revoked = 0
+
+    def new_filter(self, rows):
+        capacity = settings.REVOCATION_BLOOM_CAPACITY
+        while capacity < rows * 2:
+            capacity *= 2
+        return BloomFilter(capacity, settings.REVOCATION_BLOOM_ERROR_RATE)
+
+    def refresh(self, force=False):
+        now = time.monotonic()
+        interval = settings.REVOCATION_REFRESH_INTERVAL
+        if not force and self.bloom is not None \
+                and now - self.refreshed < interval:
+            return
+        with self.lock:
+            # Проверки читают self.bloom без блокировки, поэтому новый
+            # фильтр заполняется локально и подменяется одним
+            # присваиванием: пустой фильтр пропустил бы отозванный токен.
+            bloom, last_id = self.bloom, self.last_id
+            if bloom is None or bloom.count >= bloom.capacity:
+                # Переполненный фильтр строим заново и большего размера.
+                bloom = self.new_filter(RevokedToken.objects.count())
+                last_id = 0
+            rows = RevokedToken.objects.filter(
+                pk__gt=last_id
+            ).order_by('pk').values_list('pk', 'jti')
+            for pk, jti in rows.iterator():
+                bloom.add(jti)
+                last_id = pk
+            self.bloom, self.last_id = bloom, last_id
+            self.refreshed = now
+
+    def add(self, jti):
+        """ Токен, отозванный в этом процессе, отвергается сразу. """
+        self.refresh()
+        with self.lock:
+            if self.bloom is not None:
+                self.bloom.add(jti)
+
+    def is_revoked(self, jti):
+        self.checks += 1
+        if jti is None:
+            return False
+        self.refresh()
+        # reset() в другом потоке может обнулить фильтр после refresh();
+        # без фильтра решает таблица.
+        bloom = self.bloom
+        if bloom is not None and jti not in bloom:
+            return False
+        self.bloom_positives += 1
+        revoked = RevokedToken.objects.filter(jti=jti).exists()
+        if revoked:
+            self.revoked += 1
+        return revoked
+
+    def reset(self):
+        with self.lock:
+            self.bloom = None
+            self.last_id = 0
+
+    def stats(self):
+        bloom = self.bloom
+        return {
+            'size': bloom.count if bloom else 0,
+            'checks': self.checks,
+            'bloom_positives': self.bloom_positives,
+            'revoked': self.revoked,
+        }
+
+
+revocation_list = RevocationList()
+register('revocation')(revocation_list.stats)
+
+
+def revoke_token(token, user=None):
+    """ Отзывает токен simplejwt (access или refresh) до конца срока. """
+    jti = token[api_settings.JTI_CLAIM]
+    expires_at = datetime.fromtimestamp(token['exp'], tz=dt_timezone.utc)
+    RevokedToken.objects.get_or_create(
+        jti=jti, defaults={'user': user, 'expires_at': expires_at}
+    )
+    revocation_list.add(jti)
+    return jti
+
+
+def prune_revoked_tokens():
+    """ Истекшие токены и так не пройдут проверку, строки не нужны. """
+    deleted, _ = RevokedToken.objects.filter(
+        expires_at__lt=timezone.now()
+    ).delete()
+    return deleted
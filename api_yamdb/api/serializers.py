@@ -1,14 +1,16 @@
 from django.conf import settings
 from django.contrib.auth.tokens import default_token_generator
-from django.core.mail import send_mail
 from django.db import IntegrityError, transaction
-from django.db.models import Avg
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 from rest_framework.generics import get_object_or_404
 from rest_framework.relations import SlugRelatedField
+from rest_framework.validators import UniqueValidator
 
+from reviews.fts import match_expression
 from reviews.models import Category, Comment, Genre, Review, Title, User
+from .lookups import category_slugs, genre_slugs, verify_ids
+from .outbox import enqueue_email
 
 
 class UserCreateCustomSerializer(serializers.ModelSerializer):
@@ -39,10 +41,11 @@ class UserCreateCustomSerializer(serializers.ModelSerializer):
             user.is_active = False
             user.save(update_fields=["is_active"])
             token = default_token_generator.make_token(user)
-            send_mail('Тема письма',
-                      f'Confirmation code {token}',
-                      settings.SITE_EMAIL,
-                      [user.email],)
+            # Письмо уходит из очереди командой send_outbox, транзакция
+            # не ждет почтовый сервер.
+            enqueue_email('Тема письма',
+                          f'Confirmation code {token}',
+                          user.email)
         return user
 
 
@@ -76,8 +79,26 @@ class CustomUsernamedAndTokenSerializer(serializers.Serializer):
             )
 
 
+class LowercaseSlugField(serializers.SlugField):
+    """ slug категорий и жанров хранится в нижнем регистре. Приводим
+        его до проверки уникальности, чтобы "Films" при существующем
+        "films" давал 400, а не ошибку базы. """
+
+    def __init__(self, model, **kwargs):
+        field = model._meta.get_field('slug')
+        kwargs.setdefault('max_length', field.max_length)
+        kwargs.setdefault('validators', [
+            UniqueValidator(queryset=model.objects.all())
+        ])
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        return super().to_internal_value(data).lower()
+
+
 class CategorySerializer(serializers.ModelSerializer):
     """ Сериализатор для категорий. """
+    slug = LowercaseSlugField(Category)
 
     class Meta:
         model = Category
@@ -86,6 +107,7 @@ class CategorySerializer(serializers.ModelSerializer):
 
 class GenreSerializer(serializers.ModelSerializer):
     """ Сериализатор для жанров. """
+    slug = LowercaseSlugField(Genre)
 
     class Meta:
         model = Genre
@@ -96,7 +118,7 @@ class TitleListSerializer(serializers.ModelSerializer):
     """ Сериализатор для тайтлов. """
     category = CategorySerializer(read_only=True)
     genre = GenreSerializer(many=True, read_only=True)
-    rating = serializers.SerializerMethodField()
+    rating = serializers.FloatField(read_only=True)
 
     class Meta:
         model = Title
@@ -104,23 +126,65 @@ class TitleListSerializer(serializers.ModelSerializer):
             'id', 'name', 'year', 'description', 'category', 'genre', 'rating'
         )
 
-    def get_rating(self, obj):
-        return obj.reviews.all().aggregate(Avg('score'))['score__avg']
+
+class CachedSlugRelatedField(SlugRelatedField):
+    """ Поле по slug, которое берет id из таблицы в памяти процесса
+        вместо SELECT на каждое значение. """
+
+    def __init__(self, lookup, **kwargs):
+        self.lookup = lookup
+        kwargs.setdefault('queryset', lookup.model.objects.all())
+        super().__init__(slug_field='slug', **kwargs)
+
+    def to_internal_value(self, data):
+        if not isinstance(data, str):
+            self.fail('invalid')
+        instance = self.lookup.get_instance(data)
+        if instance is None:
+            self.fail('does_not_exist', slug_name=self.slug_field, value=data)
+        return instance
 
 
 class TitleOtherSerializer(serializers.ModelSerializer):
     """ Сериализатор для тайтлов. """
-    category = serializers.SlugRelatedField(
-        queryset=Category.objects.all(), slug_field='slug'
-    )
-    genre = serializers.SlugRelatedField(
-        queryset=Genre.objects.all(), many=True, slug_field='slug'
-    )
+    category = CachedSlugRelatedField(category_slugs)
+    genre = CachedSlugRelatedField(genre_slugs, many=True)
 
     class Meta:
         model = Title
         fields = ('id', 'name', 'year', 'description', 'category', 'genre')
 
+    def validate(self, attrs):
+        """ id из таблиц в памяти перед записью сверяются с базой:
+            устаревший id дал бы IntegrityError вместо ошибки 400. """
+        fields = {}
+        for name in ('category', 'genre'):
+            field = self.fields[name]
+            many = hasattr(field, 'child_relation')
+            value = attrs.get(name)
+            instances = value if many else [value]
+            if value:
+                relation = field.child_relation if many else field
+                fields[relation.lookup] = name, many, relation, instances
+        stale = verify_ids(
+            (lookup, [item.pk for item in instances])
+            for lookup, (_, _, _, instances) in fields.items()
+        )
+        for lookup in stale:
+            name, many, relation, instances = fields[lookup]
+            # Таблица перечитана: slug могли пересоздать с новым id.
+            fresh = []
+            for item in instances:
+                found = lookup.get_instance(item.slug)
+                if found is None:
+                    message = relation.error_messages['does_not_exist']
+                    raise ValidationError({name: [message.format(
+                        slug_name=relation.slug_field, value=item.slug
+                    )]})
+                fresh.append(found)
+            attrs[name] = fresh if many else fresh[0]
+        return attrs
+
 
 class ReviewSerializer(serializers.ModelSerializer):
     """ Сериализатор для отзывов. """
@@ -156,3 +220,55 @@ class CommentSerializer(serializers.ModelSerializer):
         model = Comment
         fields = ('id', 'text', 'author', 'pub_date')
         read_only_fields = ('review', 'author')
+
+
+class TextSearchParamsSerializer(serializers.Serializer):
+    """ Параметры поиска по текстам отзывов и комментариев. """
+    q = serializers.CharField()
+    type = serializers.ChoiceField(
+        choices=('review', 'comment'), default='review'
+    )
+    title = serializers.IntegerField(required=False, min_value=1)
+    author = serializers.CharField(required=False)
+    since = serializers.DateTimeField(required=False)
+    until = serializers.DateTimeField(required=False)
+
+    def validate_q(self, value):
+        if match_expression(value) is None:
+            raise ValidationError('В запросе нет слов для поиска')
+        return value
+
+
+class AutocompleteParamsSerializer(serializers.Serializer):
+    """ Параметры подсказок для строки поиска. """
+    q = serializers.CharField(allow_blank=True, max_length=100)
+    limit = serializers.IntegerField(
+        min_value=1, max_value=settings.AUTOCOMPLETE_MAX_LIMIT,
+        default=settings.AUTOCOMPLETE_LIMIT
+    )
+
+
+class TextSearchResultSerializer(serializers.Serializer):
+    """ Найденный отзыв или комментарий с фрагментом текста. """
+    type = serializers.SerializerMethodField()
+    id = serializers.IntegerField()
+    title_id = serializers.SerializerMethodField()
+    review_id = serializers.SerializerMethodField()
+    author = serializers.CharField(source='author.username')
+    pub_date = serializers.DateTimeField()
+    snippet = serializers.SerializerMethodField()
+
+    def get_type(self, obj):
+        return obj._meta.model_name
+
+    def get_title_id(self, obj):
+        if isinstance(obj, Comment):
+            return obj.review.title_id
+        return obj.title_id
+
+    def get_review_id(self, obj):
+        return obj.review_id if isinstance(obj, Comment) else obj.id
+
+    def get_snippet(self, obj):
+        # Без FTS5 фрагмент - просто начало текста.
+        return getattr(obj, 'search_snippet', obj.text[:200])
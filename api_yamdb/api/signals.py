@@ -0,0 +1,69 @@
+from django.db.models.signals import (m2m_changed, post_delete, post_migrate,
+                                      post_save)
+from django.dispatch import receiver
+
+from reviews.models import Category, Comment, Genre, Review, Title, User
+from .authentication import user_cache
+from .autocomplete import autocomplete
+from .caching import bump_version, bump_version_on_commit
+from .revocation import revocation_list
+from .throttling import reset_throttles
+from .tokens import drop_token_state, set_token_state
+
+VERSIONED_MODELS = (User, Category, Genre, Title, Review, Comment)
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def bump_model_version(sender, using=None, **kwargs):
+    """ Любая запись в модель сбрасывает кэши, построенные на ней. """
+    if sender in VERSIONED_MODELS:
+        bump_version_on_commit(sender, using)
+
+
+@receiver(post_save, sender=User)
+def drop_cached_user(sender, instance, **kwargs):
+    """ Смена роли, is_active или профиля сразу видна следующему
+        запросу этого пользователя, а токены со старой версией прав
+        перестают приниматься. """
+    user_cache.invalidate(instance.pk)
+    set_token_state(instance)
+
+
+@receiver(post_delete, sender=User)
+def drop_deleted_user(sender, instance, **kwargs):
+    user_cache.invalidate(instance.pk)
+    drop_token_state(instance.pk)
+
+
+@receiver(post_save, sender=Title)
+@receiver(post_save, sender=Genre)
+@receiver(post_save, sender=Category)
+def update_autocomplete(sender, instance, using=None, **kwargs):
+    autocomplete.update(instance, using)
+
+
+@receiver(post_delete, sender=Title)
+@receiver(post_delete, sender=Genre)
+@receiver(post_delete, sender=Category)
+def remove_from_autocomplete(sender, instance, using=None, **kwargs):
+    autocomplete.remove(instance, using)
+
+
+@receiver(m2m_changed, sender=Title.genre.through)
+def bump_title_genre_version(sender, action, using=None, **kwargs):
+    if action.startswith('post_'):
+        bump_version_on_commit(Title, using)
+
+
+@receiver(post_migrate)
+def bump_versions_after_migrate(sender, **kwargs):
+    """ migrate и flush меняют данные мимо сигналов моделей. """
+    if sender.label != Title._meta.app_label:
+        return
+    for model in VERSIONED_MODELS:
+        bump_version(model)
+    user_cache.clear()
+    revocation_list.reset()
+    autocomplete.reset()
+    reset_throttles()
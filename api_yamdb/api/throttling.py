@@ -0,0 +1,149 @@
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+from .caching import make_key
+from .metrics import register
+
+
+class LocalBucketStore:
+    """ Ведра в памяти процесса. Число ведер ограничено, давно не
+        тронутые вытесняются первыми. """
+
+    def __init__(self, max_size=100000):
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        self.buckets = OrderedDict()
+
+    def consume(self, key, capacity, refill, now):
+        with self.lock:
+            tokens, updated = self.buckets.pop(key, (capacity, now))
+            tokens, wait = take_token(tokens, updated, capacity, refill, now)
+            self.buckets[key] = (tokens, now)
+            while len(self.buckets) > self.max_size:
+                self.buckets.popitem(last=False)
+        return wait
+
+    def clear(self):
+        with self.lock:
+            self.buckets.clear()
+
+
+class CacheBucketStore:
+    """ Ведра в общем кэше Django, чтобы лимит был общим для всех
+        процессов. Чтение и запись не атомарны: при гонке запрос
+        может пройти лишний раз, что для защиты от ботов допустимо. """
+
+    def consume(self, key, capacity, refill, now):
+        cache_key = make_key('throttle', key)
+        tokens, updated = cache.get(cache_key, (capacity, now))
+        tokens, wait = take_token(tokens, updated, capacity, refill, now)
+        cache.set(cache_key, (tokens, now), int(capacity / refill) + 1)
+        return wait
+
+    def clear(self):
+        pass
+
+
+def take_token(tokens, updated, capacity, refill, now):
+    """ Пополняет ведро за прошедшее время и берет из него жетон.
+        Возвращает новое число жетонов и сколько секунд ждать,
+        если жетона не хватило (None - запрос пропускаем). """
+    tokens = min(capacity, tokens + (now - updated) * refill)
+    if tokens >= 1:
+        return tokens - 1, None
+    return tokens, (1 - tokens) / refill
+
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+STORES = {
+    'local': LocalBucketStore,
+    'cache': CacheBucketStore,
+}
+_stores = {}
+counters = Counter()
+
+
+def get_store():
+    name = settings.THROTTLE_STORE
+    if name not in _stores:
+        _stores[name] = STORES[name]()
+    return _stores[name]
+
+
+def reset_throttles():
+    for store in _stores.values():
+        store.clear()
+
+
+@register('throttle')
+def throttle_stats():
+    return dict(counters)
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """ Ведро жетонов: скорость из DEFAULT_THROTTLE_RATES по scope
+        ('5/min' - ведро на 5 запросов, жетон возвращается раз в 12
+        секунд). Решение принимается до обращения к базе. """
+    scope = None
+
+    def __init__(self):
+        rate = api_settings.DEFAULT_THROTTLE_RATES[self.scope]
+        count, period = rate.split('/')
+        self.capacity = int(count)
+        self.refill = self.capacity / PERIODS[period[0]]
+        self.wait_time = None
+
+    def get_ident_key(self, request, view):
+        """ Ключ ведра; None - запрос не ограничивается. По умолчанию
+            IP клиента с учетом NUM_PROXIES. """
+        return self.get_ident(request)
+
+    def allow_request(self, request, view):
+        ident = self.get_ident_key(request, view)
+        if ident is None:
+            return True
+        self.wait_time = get_store().consume(
+            f'{self.scope}:{ident}', self.capacity, self.refill, time.time()
+        )
+        allowed = self.wait_time is None
+        counters[f'{self.scope}.{"allowed" if allowed else "rejected"}'] += 1
+        return allowed
+
+    def wait(self):
+        return self.wait_time
+
+
+class IPThrottle(TokenBucketThrottle):
+    """ Ведро на IP клиента - ключ по умолчанию. """
+
+
+class UsernameThrottle(TokenBucketThrottle):
+
+    def get_ident_key(self, request, view):
+        data = request.data
+        username = data.get('username') if hasattr(data, 'get') else None
+        if not isinstance(username, str) or not username:
+            return None
+        return username.lower()
+
+
+class SignupIPThrottle(IPThrottle):
+    scope = 'signup_ip'
+
+
+class SignupUsernameThrottle(UsernameThrottle):
+    scope = 'signup_username'
+
+
+class TokenIPThrottle(IPThrottle):
+    scope = 'token_ip'
+
+
+class TokenUsernameThrottle(UsernameThrottle):
+    scope = 'token_username'
@@ -0,0 +1,87 @@
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import router
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from reviews.models import User
+
+TOKEN_STATE_KEY = 'api:token_state:{}'
+
+
+class RoleRefreshToken(RefreshToken):
+    """ Токен с ролью пользователя. Подпись защищает роль от подмены,
+        поэтому права проверяются без загрузки пользователя из базы.
+        Access токен получает те же claims. """
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        token['username'] = user.username
+        token['role'] = user.role
+        token['is_staff'] = user.is_staff
+        token['role_version'] = user.role_version
+        return token
+
+
+def get_token_state(user_id):
+    """ Версия прав пользователя и время отзыва его токенов или None,
+        если пользователя нет. """
+    key = TOKEN_STATE_KEY.format(user_id)
+    state = cache.get(key)
+    if state is None:
+        state = User.objects.filter(pk=user_id).values_list(
+            'role_version', 'tokens_revoked_at'
+        ).first()
+        if state is not None:
+            cache.set(key, state, settings.USER_CACHE_TIMEOUT)
+    return state
+
+
+def set_token_state(user):
+    cache.set(
+        TOKEN_STATE_KEY.format(user.pk),
+        (user.role_version, user.tokens_revoked_at),
+        settings.USER_CACHE_TIMEOUT
+    )
+
+
+def drop_token_state(user_id):
+    cache.delete(TOKEN_STATE_KEY.format(user_id))
+
+
+def issued_at(validated_token):
+    """ simplejwt 4.x не пишет claim iat, поэтому время выдачи
+        считается от exp назад на срок жизни токена его типа. Секунды
+        в exp отброшены, так что результат не позже настоящего. """
+    expires = datetime.fromtimestamp(validated_token['exp'],
+                                     tz=dt_timezone.utc)
+    return expires - validated_token.lifetime
+
+
+def is_revoked_for_user(validated_token, revoked_at):
+    return revoked_at is not None and issued_at(validated_token) <= revoked_at
+
+
+def has_role_claims(validated_token):
+    return 'role' in validated_token
+
+
+def user_from_token(validated_token):
+    """ Пользователь, собранный из claims токена. В нем есть только id,
+        username, роль и is_staff - этого хватает проверкам прав и
+        для внешних ключей. Сохранять такой объект нельзя: остальные
+        поля пустые, полного пользователя нужно читать из базы. """
+    user = User(
+        pk=validated_token[api_settings.USER_ID_CLAIM],
+        username=validated_token.get('username', ''),
+        role=validated_token['role'],
+        is_staff=validated_token.get('is_staff', False),
+        is_active=True,
+        role_version=validated_token.get('role_version', 0),
+    )
+    user._state.adding = False
+    user._state.db = router.db_for_read(User)
+    return user
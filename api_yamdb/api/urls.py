@@ -2,11 +2,15 @@ from django.urls import include, path
 from rest_framework.routers import SimpleRouter
 
 from .views import (ActivateToken,
+                    AutocompleteView,
                     CategoryViewSet,
                     CommentViewSet,
                     CreateUser,
                     GenreViewSet,
+                    MetricsView,
                     ReviewViewSet,
+                    RevokeToken,
+                    TextSearchView,
                     TitleViewSet,
                     UserViewSet,)
 
@@ -15,6 +19,7 @@ router = SimpleRouter()
 auth = [
     path('signup/', CreateUser.as_view()),
     path('token/', ActivateToken.as_view()),
+    path('revoke/', RevokeToken.as_view()),
 ]
 
 router.register('users', UserViewSet)
@@ -30,5 +35,8 @@ router.register(
 
 urlpatterns = [
     path('v1/auth/', include(auth)),
+    path('v1/autocomplete/', AutocompleteView.as_view()),
+    path('v1/metrics/', MetricsView.as_view()),
+    path('v1/moderation/search/', TextSearchView.as_view()),
     path('v1/', include(router.urls)),
 ]
@@ -3,19 +3,33 @@ from django_filters.rest_framework import DjangoFilterBackend
 from django.dispatch import Signal
 from rest_framework import filters, mixins, status, viewsets
 from rest_framework.decorators import action
-from rest_framework.generics import CreateAPIView, get_object_or_404
-from rest_framework.permissions import AllowAny
-from rest_framework.pagination import PageNumberPagination
-from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework.generics import (CreateAPIView, ListAPIView,
+                                     get_object_or_404)
+from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.views import APIView
 
 
 from reviews.models import User, Category, Genre, Title, Review, Comment
-from .filters import TitleFilter
+from .autocomplete import autocomplete
+from .filters import (TitleFilter, TitleOrderingFilter, TitleSearchFilter,
+                      text_search)
+from .metrics import collect
+from .caching import get_versions
+from .revocation import revoke_token
+from .throttling import (SignupIPThrottle, SignupUsernameThrottle,
+                         TokenIPThrottle, TokenUsernameThrottle)
+from .tokens import RoleRefreshToken
+from .mixins import (AnonymousDetailCacheMixin, AnonymousResponseCacheMixin,
+                     ConditionalGetMixin)
+from .pagination import (CachedCountPagination, PageNumberOrKeysetPagination,
+                         RowidKeysetPagination)
 from .permissions import (AdminOrReadOnly,
                           AuthorOrModeratorOrAdminOrReadOnly,
                           AdminOrSuperUser,
+                          AdminOrSuperUserOrModerator,
                           AdminOrAuthUser)
+from .replicas import ReplicaReadMixin
 from .serializers import (UserCreateCustomSerializer,
                           CategorySerializer,
                           GenreSerializer,
@@ -24,7 +38,10 @@ from .serializers import (UserCreateCustomSerializer,
                           ReviewSerializer,
                           CommentSerializer,
                           UserSerializers,
-                          CustomUsernamedAndTokenSerializer)
+                          CustomUsernamedAndTokenSerializer,
+                          TextSearchParamsSerializer,
+                          TextSearchResultSerializer,
+                          AutocompleteParamsSerializer)
 
 
 # New user has registered. Args: user, request.
@@ -40,7 +57,7 @@ class UserViewSet(viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializers
     permission_classes = (AdminOrSuperUser,)
-    pagination_class = PageNumberPagination
+    pagination_class = CachedCountPagination
 
     def get_permissions(self):
         if self.action == 'me':
@@ -56,6 +73,9 @@ class UserViewSet(viewsets.ModelViewSet):
     @action(['get', 'patch', 'delete'], detail=False, url_name='me')
     def me(self, request, *args, **kwargs):
         user = request.user
+        if user.is_authenticated:
+            # В request.user только claims токена, профиль читаем целиком.
+            user = get_object_or_404(User, pk=user.pk)
         if request.method == 'GET':
             if user.is_authenticated:
                 serializer = self.get_serializer(user)
@@ -68,7 +88,7 @@ class UserViewSet(viewsets.ModelViewSet):
                     user, data=request.data, partial=partial
                 )
                 serializer.is_valid(raise_exception=True)
-                serializer.save(role=request.user.role, partial=True)
+                serializer.save(role=user.role, partial=True)
                 return Response(serializer.data)
             return Response(status=status.HTTP_401_UNAUTHORIZED)
         if request.method == 'DELETE':
@@ -104,6 +124,7 @@ class CreateUser(CreateAPIView):
     queryset = User.objects.all()
     serializer_class = UserCreateCustomSerializer
     permission_classes = (AllowAny,)
+    throttle_classes = (SignupIPThrottle, SignupUsernameThrottle)
 
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -120,13 +141,14 @@ class ActivateToken(CreateAPIView):
     serializer_class = CustomUsernamedAndTokenSerializer
     queryset = User.objects.all()
     permission_classes = (AllowAny,)
+    throttle_classes = (TokenIPThrottle, TokenUsernameThrottle)
     token_generator = default_token_generator
 
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         user = serializer.user
-        refresh = RefreshToken.for_user(user)
+        refresh = RoleRefreshToken.for_user(user)
         if user.is_active is True:
             token = {
                 'refresh': str(refresh),
@@ -138,7 +160,7 @@ class ActivateToken(CreateAPIView):
         user_activated.send(
             sender=self.__class__, user=user, request=self.request
         )
-        refresh = RefreshToken.for_user(user)
+        refresh = RoleRefreshToken.for_user(user)
         token = {
             'refresh': str(refresh),
             'access': str(refresh.access_token),
@@ -146,6 +168,23 @@ class ActivateToken(CreateAPIView):
         return Response(token, status=status.HTTP_200_OK)
 
 
+class RevokeToken(APIView):
+    """ Выход: токен, с которым пришел запрос, больше не принимается. """
+    permission_classes = (IsAuthenticated,)
+
+    def post(self, request):
+        revoke_token(request.auth, request.user)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class MetricsView(APIView):
+    """ Внутренние метрики процесса и очередей, только для админа. """
+    permission_classes = (AdminOrSuperUser,)
+
+    def get(self, request):
+        return Response(collect())
+
+
 class CreateListDestroyViewSet(mixins.CreateModelMixin,
                                mixins.ListModelMixin,
                                mixins.DestroyModelMixin,
@@ -154,7 +193,8 @@ class CreateListDestroyViewSet(mixins.CreateModelMixin,
        в других отображениях. """
 
 
-class CategoryViewSet(CreateListDestroyViewSet):
+class CategoryViewSet(ReplicaReadMixin, AnonymousResponseCacheMixin,
+                      CreateListDestroyViewSet):
     """
     Вьюесет модели Category
     CategoryViewSet реализует операции:
@@ -162,12 +202,14 @@ class CategoryViewSet(CreateListDestroyViewSet):
         <GET> - получение списка категорий, доступно без токена
         <DELETE> - удаление категории, доступно только Администратору
     Есть поиск по полю 'name'
+    Анонимные GET запросы отдаются из кэша
     """
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
+    response_cache_models = (Category,)
     filter_backends = (DjangoFilterBackend, filters.SearchFilter)
     search_fields = ('name',)
-    pagination_class = PageNumberPagination
+    pagination_class = CachedCountPagination
     lookup_field = 'slug'
 
     def get_permissions(self):
@@ -178,7 +220,8 @@ class CategoryViewSet(CreateListDestroyViewSet):
         return super(CategoryViewSet, self).get_permissions()
 
 
-class GenreViewSet(CreateListDestroyViewSet):
+class GenreViewSet(ReplicaReadMixin, AnonymousResponseCacheMixin,
+                   CreateListDestroyViewSet):
     """
     Вьюесет модели Genre
     GenreViewSet реализует операции:
@@ -186,12 +229,14 @@ class GenreViewSet(CreateListDestroyViewSet):
         <GET> - получение списка категорий, доступно без токена
         <DELETE> - удаление категории, доступно только Администратору
     Есть поиск по полю 'name'
+    Анонимные GET запросы отдаются из кэша
     """
     queryset = Genre.objects.all()
     serializer_class = GenreSerializer
+    response_cache_models = (Genre,)
     filter_backends = (DjangoFilterBackend, filters.SearchFilter)
     search_fields = ('name',)
-    pagination_class = PageNumberPagination
+    pagination_class = CachedCountPagination
     lookup_field = 'slug'
 
     def get_permissions(self):
@@ -202,7 +247,8 @@ class GenreViewSet(CreateListDestroyViewSet):
         return super(GenreViewSet, self).get_permissions()
 
 
-class TitleViewSet(viewsets.ModelViewSet):
+class TitleViewSet(ReplicaReadMixin, AnonymousDetailCacheMixin,
+                   ConditionalGetMixin, viewsets.ModelViewSet):
     """
     Вьюсет модели Title
     GenreViewSet реализует операции:
@@ -210,12 +256,39 @@ class TitleViewSet(viewsets.ModelViewSet):
         <GET> - получение списка тайтлов, доступно без токена
         <GET + {title id}> - получение информации о тайтле, доступно без токена
         <DELETE> - удаление категории, доступно только Администратору
-    Реализована фильтрация по полям: 'category', 'genre', 'name', 'year'
+    Реализована фильтрация по полям: 'category', 'genre', 'name', 'year',
+    по диапазону рейтинга 'rating_min', 'rating_max' и сортировка
+    'ordering' по полям 'rating', 'year', 'name'
+    Полнотекстовый поиск 'search' по названию и описанию
+    Анонимные GET запросы отдаются из кэша, на условные GET запросы
+    по ETag/Last-Modified отдается 304
     """
     queryset = Title.objects.all()
-    pagination_class = PageNumberPagination
-    filter_backends = (DjangoFilterBackend,)
+    pagination_class = CachedCountPagination
+    filter_backends = (DjangoFilterBackend, TitleOrderingFilter,
+                       TitleSearchFilter)
     filterset_class = TitleFilter
+    # Фильтры тайтлов смотрят в жанры, категории и рейтинг по отзывам.
+    count_cache_models = (Title, Genre, Category, Review)
+    response_cache_models = count_cache_models
+    ordering_fields = ('rating', 'year', 'name')
+    ordering = ('id',)
+
+    def get_version_stamp(self):
+        if self.action == 'list':
+            return get_versions(self.response_cache_models), None
+        return Title.objects.filter(
+            pk=self.kwargs.get('pk')
+        ).values_list('revision', 'modified').first()
+
+    def get_queryset(self):
+        if self.request.method == "GET":
+            # Категория и жанры страницы забираются двумя запросами,
+            # рейтинг хранится в самом тайтле.
+            return Title.objects.select_related(
+                'category'
+            ).prefetch_related('genre')
+        return Title.objects.all()
 
     def get_serializer_class(self):
         if self.request.method == "GET":
@@ -230,13 +303,21 @@ class TitleViewSet(viewsets.ModelViewSet):
         return super(TitleViewSet, self).get_permissions()
 
 
-class ReviewViewSet(viewsets.ModelViewSet):
+class ReviewViewSet(ReplicaReadMixin, ConditionalGetMixin,
+                    viewsets.ModelViewSet):
     """ Создаем вьюсет для вывода отзывов и
-           настраиваем его."""
+           настраиваем его. С параметром ?cursor= список отдается
+           по ключу (pub_date, id) без OFFSET и COUNT(*). ETag и
+           Last-Modified берутся из ревизии тайтла."""
     queryset = Review.objects.all()
     serializer_class = ReviewSerializer
     permission_classes = (AuthorOrModeratorOrAdminOrReadOnly,)
-    pagination_class = PageNumberPagination
+    pagination_class = PageNumberOrKeysetPagination
+
+    def get_version_stamp(self):
+        return Title.objects.filter(
+            pk=self.kwargs.get('title_id')
+        ).values_list('revision', 'modified').first()
 
     def get_queryset(self):
         title_id = self.kwargs.get('title_id')
@@ -250,13 +331,22 @@ class ReviewViewSet(viewsets.ModelViewSet):
         serializer.save(title=title, author=self.request.user)
 
 
-class CommentViewSet(viewsets.ModelViewSet):
+class CommentViewSet(ReplicaReadMixin, ConditionalGetMixin,
+                     viewsets.ModelViewSet):
     """ Создаем вьюсет для вывода комментариев и
-           настраиваем его."""
+           настраиваем его. С параметром ?cursor= список отдается
+           по ключу (pub_date, id) без OFFSET и COUNT(*). ETag и
+           Last-Modified берутся из ревизии тайтла."""
     queryset = Comment.objects.all()
     serializer_class = CommentSerializer
     permission_classes = (AuthorOrModeratorOrAdminOrReadOnly,)
-    pagination_class = PageNumberPagination
+    pagination_class = PageNumberOrKeysetPagination
+
+    def get_version_stamp(self):
+        return Title.objects.filter(
+            pk=self.kwargs.get('title_id'),
+            reviews__id=self.kwargs.get('review_id'),
+        ).values_list('revision', 'modified').first()
 
     def get_queryset(self):
         review = get_object_or_404(
@@ -274,3 +364,53 @@ class CommentViewSet(viewsets.ModelViewSet):
             title__id=self.kwargs.get("title_id")
         )
         serializer.save(review=review, author=self.request.user)
+
+
+class TextSearchView(ListAPIView):
+    """ Поиск фразы в отзывах (?type=review) или комментариях
+        (?type=comment) для модераторов. Фильтры: 'title' (id тайтла),
+        'author' (username), 'since' и 'until' (pub_date). Выдача от
+        новых записей к старым с пагинацией по ключу ?cursor=. """
+    permission_classes = (AdminOrSuperUserOrModerator,)
+    serializer_class = TextSearchResultSerializer
+    pagination_class = RowidKeysetPagination
+    search_models = {'review': Review, 'comment': Comment}
+
+    def get_queryset(self):
+        params = TextSearchParamsSerializer(data=self.request.query_params)
+        params.is_valid(raise_exception=True)
+        data = params.validated_data
+        model = self.search_models[data['type']]
+        if model is Comment:
+            queryset = Comment.objects.select_related('author', 'review')
+            title_field = 'review__title_id'
+        else:
+            queryset = Review.objects.select_related('author')
+            title_field = 'title_id'
+        if 'title' in data:
+            queryset = queryset.filter(**{title_field: data['title']})
+        if 'author' in data:
+            # id автора находим отдельно, чтобы не соединять таблицы.
+            author_id = User.objects.filter(
+                username=data['author']
+            ).values_list('id', flat=True).first()
+            queryset = queryset.filter(author_id=author_id)
+        if 'since' in data:
+            queryset = queryset.filter(pub_date__gte=data['since'])
+        if 'until' in data:
+            queryset = queryset.filter(pub_date__lt=data['until'])
+        queryset, self.keyset_column = text_search(queryset, data['q'])
+        return queryset
+
+
+class AutocompleteView(APIView):
+    """ Подсказки для строки поиска: тайтлы (по убыванию рейтинга),
+        жанры и категории, в названии которых есть слова, начинающиеся
+        на слова ?q=. Отвечает из индекса в памяти процесса. """
+    permission_classes = (AllowAny,)
+
+    def get(self, request):
+        params = AutocompleteParamsSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        data = params.validated_data
+        return Response(autocomplete.search(data['q'], data['limit']))
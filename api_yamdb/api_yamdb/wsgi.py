@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'api_yamdb.settings')
 
 application = get_wsgi_application()
+
+# Подсказки отвечают из индекса в памяти процесса, собираем его сразу.
+from api.autocomplete import autocomplete  # noqa: E402
+
+autocomplete.warm()
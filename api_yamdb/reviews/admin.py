@@ -1,11 +1,62 @@
 from django.contrib import admin
+from django.utils import timezone
 
-from .models import User, Category, Genre, Title, Review
+from .models import (User, Category, Genre, OutboxEmail, RevokedToken, Title,
+                     Review)
 
 # Регистрируем модели в админке
 
-admin.site.register(User)
+
+class TitleAdmin(admin.ModelAdmin):
+    """ Рейтинг ведется по отзывам, руками его не правим. """
+    list_display = ('name', 'year', 'category', 'rating')
+    readonly_fields = ('rating', 'score_sum', 'score_count',
+                       'revision', 'modified')
+    actions = ('recalculate_rating',)
+
+    def recalculate_rating(self, request, queryset):
+        fixed = queryset.recalculate_ratings()
+        self.message_user(request, f'Исправлено рейтингов: {fixed}')
+    recalculate_rating.short_description = 'Пересчитать рейтинг'
+
+
+class OutboxEmailAdmin(admin.ModelAdmin):
+    """ Очередь писем: видно застрявшие и можно отправить их еще раз. """
+    list_display = ('to', 'subject', 'created', 'attempts',
+                    'next_attempt_at', 'sent_at')
+    list_filter = ('sent_at',)
+    readonly_fields = ('created', 'last_error')
+    actions = ('retry_now',)
+
+    def retry_now(self, request, queryset):
+        retried = queryset.filter(sent_at__isnull=True).update(
+            attempts=0, next_attempt_at=timezone.now()
+        )
+        self.message_user(request, f'Поставлено в очередь: {retried}')
+    retry_now.short_description = 'Отправить еще раз'
+
+
+class UserAdmin(admin.ModelAdmin):
+    actions = ('revoke_tokens',)
+
+    def revoke_tokens(self, request, queryset):
+        for user in queryset:
+            user.revoke_tokens()
+        self.message_user(
+            request, f'Отозваны токены пользователей: {len(queryset)}'
+        )
+    revoke_tokens.short_description = 'Отозвать все токены'
+
+
+class RevokedTokenAdmin(admin.ModelAdmin):
+    list_display = ('jti', 'user', 'expires_at', 'created')
+    search_fields = ('jti', 'user__username')
+
+
+admin.site.register(User, UserAdmin)
 admin.site.register(Category)
 admin.site.register(Genre)
-admin.site.register(Title)
+admin.site.register(Title, TitleAdmin)
 admin.site.register(Review)
+admin.site.register(OutboxEmail, OutboxEmailAdmin)
+admin.site.register(RevokedToken, RevokedTokenAdmin)
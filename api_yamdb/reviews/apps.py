@@ -3,3 +3,15 @@ from django.apps import AppConfig
 
 class ReviewsConfig(AppConfig):
     name = 'reviews'
+
+    def ready(self):
+        from django.core.signals import request_started
+        from django.db.backends.signals import connection_created
+        from django.db.models.signals import post_migrate
+
+        from . import signals  # noqa: F401
+        from .db import apply_sqlite_pragmas, check_persistent_connections
+        from .fts import restore_fts_triggers
+        connection_created.connect(apply_sqlite_pragmas)
+        request_started.connect(check_persistent_connections)
+        post_migrate.connect(restore_fts_triggers, sender=self)
@@ -0,0 +1,63 @@
+import re
+import time
+
+from django.conf import settings
+from django.db import connections
+
+PRAGMA_VALUE = re.compile(r'^-?[A-Za-z0-9_]+$')
+TRANSACTION_MODES = ('DEFERRED', 'IMMEDIATE', 'EXCLUSIVE')
+
+
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    """ Настраивает каждое новое соединение с SQLite по SQLITE_PRAGMAS:
+        WAL позволяет читателям не ждать писателя, busy_timeout
+        заставляет ждать блокировку вместо "database is locked", а
+        SQLITE_TRANSACTION_MODE задает, как начинаются транзакции. """
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = getattr(settings, 'SQLITE_PRAGMAS', {})
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            if value is None or value == '':
+                continue
+            if not PRAGMA_VALUE.match(str(name)) \
+                    or not PRAGMA_VALUE.match(str(value)):
+                raise ValueError(f'Недопустимая настройка SQLite: {name}')
+            cursor.execute(f'PRAGMA {name} = {value}')
+    mode = getattr(settings, 'SQLITE_TRANSACTION_MODE', None)
+    if mode:
+        if mode.upper() not in TRANSACTION_MODES:
+            raise ValueError(f'Недопустимый режим транзакций SQLite: {mode}')
+        begin = f'BEGIN {mode.upper()}'
+        # В WAL транзакция, начатая чтением, не может дождаться записи:
+        # если другой писатель успел зафиксироваться, SQLite сразу
+        # отвечает "database is locked", не глядя на busy_timeout.
+        # BEGIN IMMEDIATE берет блокировку записи в начале atomic(), и
+        # ожидание ограничено busy_timeout.
+        connection._start_transaction_under_autocommit = (
+            lambda: connection.cursor().execute(begin)
+        )
+
+
+def check_persistent_connections(sender, **kwargs):
+    """ Постоянное соединение могло умереть, пока процесс ждал запрос
+        (перезапуск PostgreSQL, разрыв сети). Проверяем его до
+        обработки запроса и закрываем, чтобы Django открыл новое.
+        Соединение, с которым запрос начинался меньше
+        CONN_CHECK_INTERVAL секунд назад, не проверяется: под нагрузкой
+        проверка была бы лишним обращением к базе на каждый запрос. """
+    now = time.monotonic()
+    for connection in connections.all():
+        if connection.connection is None \
+                or not connection.settings_dict['CONN_MAX_AGE'] \
+                or connection.in_atomic_block:
+            continue
+        # Запоминается само соединение: после переподключения его
+        # возраст неизвестен, и оно проверяется.
+        raw, checked = getattr(connection, 'last_request', (None, 0))
+        if raw is not connection.connection \
+                or now - checked >= settings.CONN_CHECK_INTERVAL:
+            if not connection.is_usable():
+                connection.close()
+                continue
+        connection.last_request = (connection.connection, now)
@@ -0,0 +1,148 @@
+"""
+Полнотекстовый поиск на SQLite FTS5.
+
+Индекс - это external content таблица <table>_fts: текст хранится только
+в основной таблице, а индекс поддерживают триггеры, поэтому он
+обновляется при любой записи, в том числе при bulk_create и UPDATE
+мимо моделей. unicode61 с remove_diacritics 2 приводит кириллицу
+к нижнему регистру и не различает "е" и "ё".
+
+Если миграция пересоздает основную таблицу (на SQLite так работает
+большинство AlterField), триггеры пропадают вместе со старой таблицей.
+Поэтому после каждого migrate restore_fts_triggers создает недостающие
+триггеры заново и перестраивает индекс.
+"""
+import re
+
+from django.db import OperationalError, connections
+
+TOKENIZER = 'unicode61 remove_diacritics 2'
+# Таблицы с полнотекстовым индексом и их проиндексированные колонки.
+FTS_INDEXES = {
+    'reviews_title': ('name', 'description'),
+    'reviews_review': ('text',),
+    'reviews_comment': ('text',),
+}
+WORD = re.compile(r'\w+')
+
+_available = {}
+
+
+def fts_table(table):
+    return f'{table}_fts'
+
+
+def fts_triggers(table):
+    fts = fts_table(table)
+    return [f'{fts}_ai', f'{fts}_ad', f'{fts}_au']
+
+
+def create_triggers_sql(table, columns):
+    fts = fts_table(table)
+    names = ', '.join(columns)
+    new = ', '.join(f'new.{column}' for column in columns)
+    old = ', '.join(f'old.{column}' for column in columns)
+    delete = (f"INSERT INTO {fts}({fts}, rowid, {names}) "
+              f"VALUES ('delete', old.id, {old});")
+    insert = f'INSERT INTO {fts}(rowid, {names}) VALUES (new.id, {new});'
+    return [
+        f'CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} '
+        f'BEGIN {insert} END',
+        f'CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} '
+        f'BEGIN {delete} END',
+        f'CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {names} '
+        f'ON {table} BEGIN {delete} {insert} END',
+    ]
+
+
+def rebuild_sql(table):
+    fts = fts_table(table)
+    return f"INSERT INTO {fts}({fts}) VALUES ('rebuild')"
+
+
+def create_fts_sql(table, columns):
+    names = ', '.join(columns)
+    return [
+        f"CREATE VIRTUAL TABLE {fts_table(table)} USING fts5({names}, "
+        f"content='{table}', content_rowid='id', "
+        f"tokenize='{TOKENIZER}', prefix='2 3')",
+        *create_triggers_sql(table, columns),
+        rebuild_sql(table),
+    ]
+
+
+def drop_fts_sql(table):
+    return [
+        *(f'DROP TRIGGER IF EXISTS {name}' for name in fts_triggers(table)),
+        f'DROP TABLE IF EXISTS {fts_table(table)}',
+    ]
+
+
+def create_fts_index(schema_editor, table, columns):
+    """ Для миграций: на SQLite с FTS5 создает индекс, на остальных
+        базах ничего не делает - поиск там работает через LIKE. """
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    try:
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute('CREATE VIRTUAL TABLE temp.fts5_probe '
+                           'USING fts5(text)')
+            cursor.execute('DROP TABLE temp.fts5_probe')
+    except OperationalError:
+        # SQLite собран без FTS5.
+        return
+    for sql in create_fts_sql(table, columns):
+        schema_editor.execute(sql)
+    _available.clear()
+
+
+def drop_fts_index(schema_editor, table):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in drop_fts_sql(table):
+        schema_editor.execute(sql)
+    _available.clear()
+
+
+def restore_fts_triggers(using='default', **kwargs):
+    """ Обработчик post_migrate: триггеры индексов, потерянные при
+        пересоздании таблицы, создаются заново, а индекс, пропустивший
+        записи без триггеров, перестраивается. """
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+        tables = {row[0] for row in cursor.fetchall()}
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")
+        triggers = {row[0] for row in cursor.fetchall()}
+        for table, columns in FTS_INDEXES.items():
+            if fts_table(table) not in tables \
+                    or triggers.issuperset(fts_triggers(table)):
+                continue
+            for sql in create_triggers_sql(table, columns):
+                cursor.execute(sql)
+            cursor.execute(rebuild_sql(table))
+
+
+def fts_available(connection, table):
+    """ Есть ли полнотекстовый индекс для таблицы в этой базе. """
+    key = (connection.alias, table)
+    if key not in _available:
+        _available[key] = (
+            connection.vendor == 'sqlite'
+            and fts_table(table) in connection.introspection.table_names()
+        )
+    return _available[key]
+
+
+def match_expression(text):
+    """ Запрос MATCH из пользовательского ввода: все слова должны
+        встретиться как префиксы слов текста - так находятся и
+        недонабранное слово, и другие падежи ("шоушенк" -> "Шоушенка").
+        Слова берутся в кавычки, поэтому синтаксис FTS5 во вводе
+        ничего не ломает. None - искать нечего. """
+    words = WORD.findall(text)
+    if not words:
+        return None
+    return ' '.join(f'"{word}"*' for word in words)
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from reviews.models import Title
+
+
+class Command(BaseCommand):
+    """ Сверяем хранимый рейтинг тайтлов с отзывами и чиним
+        разошедшиеся значения. """
+
+    help = 'Пересчитывает рейтинг тайтлов по отзывам.'
+
+    def handle(self, *args, **options):
+        fixed = Title.objects.recalculate_ratings()
+        self.stdout.write(
+            self.style.SUCCESS(f'Исправлено рейтингов: {fixed}')
+        )
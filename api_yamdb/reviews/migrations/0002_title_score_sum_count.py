@@ -0,0 +1,41 @@
+# Generated by Django 2.2.16 on 2026-10-18 18:51
+
+from django.db import migrations, models
+from django.db.models import Avg, Count, Sum
+
+
+def fill_rating(apps, schema_editor):
+    Title = apps.get_model('reviews', 'Title')
+    db_alias = schema_editor.connection.alias
+    titles = Title.objects.using(db_alias).annotate(
+        real_sum=Sum('reviews__score'),
+        real_count=Count('reviews'),
+        real_rating=Avg('reviews__score'),
+    ).filter(real_count__gt=0)
+    for title in titles.iterator():
+        Title.objects.using(db_alias).filter(pk=title.pk).update(
+            score_sum=title.real_sum,
+            score_count=title.real_count,
+            rating=title.real_rating,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='title',
+            name='score_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Число оценок'),
+        ),
+        migrations.AddField(
+            model_name='title',
+            name='score_sum',
+            field=models.PositiveIntegerField(default=0, verbose_name='Сумма оценок'),
+        ),
+        migrations.RunPython(fill_rating, migrations.RunPython.noop),
+    ]
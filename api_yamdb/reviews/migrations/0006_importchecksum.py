@@ -0,0 +1,29 @@
+# Generated by Django 2.2.16 on 2026-10-18 19:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0005_title_revision_modified'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportChecksum',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('table', models.CharField(max_length=50)),
+                ('key', models.CharField(blank=True, max_length=50)),
+                ('digest', models.CharField(max_length=32)),
+            ],
+            options={
+                'verbose_name_plural': 'Отпечатки выгрузки',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='importchecksum',
+            constraint=models.UniqueConstraint(fields=('table', 'key'), name='unique_import_checksum'),
+        ),
+    ]
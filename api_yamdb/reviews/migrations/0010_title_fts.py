@@ -0,0 +1,22 @@
+from django.db import migrations
+
+from reviews.fts import create_fts_index, drop_fts_index
+
+
+def create_title_fts(apps, schema_editor):
+    create_fts_index(schema_editor, 'reviews_title', ['name', 'description'])
+
+
+def drop_title_fts(apps, schema_editor):
+    drop_fts_index(schema_editor, 'reviews_title')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0009_revokedtoken'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_title_fts, drop_title_fts),
+    ]
@@ -0,0 +1,26 @@
+from django.db import migrations
+
+from reviews.fts import create_fts_index, drop_fts_index
+
+TABLES = ('reviews_review', 'reviews_comment')
+
+
+def create_text_fts(apps, schema_editor):
+    for table in TABLES:
+        create_fts_index(schema_editor, table, ['text'])
+
+
+def drop_text_fts(apps, schema_editor):
+    for table in TABLES:
+        drop_fts_index(schema_editor, table)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0010_title_fts'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_text_fts, drop_text_fts),
+    ]
@@ -0,0 +1,42 @@
+from django.db import migrations
+
+
+def lowercase_slugs(apps, schema_editor):
+    """ Приводим slug категорий и жанров к нижнему регистру. Если
+        такой slug в нижнем регистре уже есть, записи сливаются:
+        тайтлы переходят к оставшейся категории или жанру. """
+    db = schema_editor.connection.alias
+    Title = apps.get_model('reviews', 'Title')
+    links = Title.genre.through.objects.using(db)
+    for name in ('Category', 'Genre'):
+        model = apps.get_model('reviews', name)
+        existing = dict(model.objects.using(db).values_list('slug', 'id'))
+        for slug, pk in sorted(existing.items()):
+            lower = slug.lower()
+            if lower == slug:
+                continue
+            target = existing.get(lower)
+            if target is None:
+                model.objects.using(db).filter(pk=pk).update(slug=lower)
+                existing[lower] = pk
+                continue
+            if name == 'Category':
+                Title.objects.using(db).filter(
+                    category_id=pk
+                ).update(category_id=target)
+            else:
+                linked = links.filter(genre_id=target).values('title_id')
+                links.filter(genre_id=pk, title_id__in=linked).delete()
+                links.filter(genre_id=pk).update(genre_id=target)
+            model.objects.using(db).filter(pk=pk).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0011_review_comment_fts'),
+    ]
+
+    operations = [
+        migrations.RunPython(lowercase_slugs, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,9 @@
 from django.contrib.auth.models import AbstractUser
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Avg, Case, Count, F, FloatField, Sum, Value, When
+from django.db.models.functions import Cast
+from django.utils import timezone
 
 
 class User(AbstractUser):
@@ -24,9 +27,73 @@ class User(AbstractUser):
     )
     role = models.CharField(verbose_name='Роль пользователя', max_length=200,
                             default=ROLE_USER, choices=ROLE_CHOICES)
+    role_version = models.PositiveIntegerField(default=0, editable=False)
+    # Токены, выписанные не позже этого момента, не принимаются.
+    tokens_revoked_at = models.DateTimeField(null=True, blank=True,
+                                             editable=False)
 
+    # Поля, от которых зависят права. Их смена увеличивает role_version,
+    # и токены, выписанные со старой версией, перестают приниматься.
+    ACCESS_FIELDS = ('role', 'is_staff', 'is_superuser', 'is_active')
 
-class Category(models.Model):
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.remember_access()
+        instance._loaded_username = instance.__dict__.get('username')
+        return instance
+
+    def access_state(self):
+        return tuple(self.__dict__.get(name) for name in self.ACCESS_FIELDS)
+
+    def remember_access(self):
+        self._loaded_access = self.access_state()
+
+    @property
+    def username_changed(self):
+        """ Имя автора выводится в отзывах и комментариях. """
+        loaded = getattr(self, '_loaded_username', None)
+        return loaded is not None and loaded != self.username
+
+    def save(self, *args, **kwargs):
+        loaded = getattr(self, '_loaded_access', None)
+        if loaded is not None and loaded != self.access_state():
+            self.role_version += 1
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'role_version'}
+        super().save(*args, **kwargs)
+        self.remember_access()
+        self._loaded_username = self.username
+
+    def revoke_tokens(self):
+        """ Отзывает все выписанные пользователю токены, с ролью
+            и без нее. """
+        self.tokens_revoked_at = timezone.now()
+        self.role_version += 1
+        self.save(update_fields=['tokens_revoked_at', 'role_version'])
+
+
+class LowercaseSlugMixin:
+    """ slug хранится в нижнем регистре, чтобы фильтры искали его
+        точным сравнением по уникальному индексу, а не через UPPER()
+        или LIKE. bulk_create обходит save(), поэтому импорт из CSV
+        приводит slug сам. """
+
+    def clean(self):
+        # Формы (в том числе админка) проверяют уникальность после
+        # clean(), и "Films" при существующем "films" должен дать
+        # ошибку формы, а не IntegrityError при сохранении.
+        super().clean()
+        if self.slug:
+            self.slug = self.slug.lower()
+
+    def save(self, *args, **kwargs):
+        self.slug = self.slug.lower()
+        super().save(*args, **kwargs)
+
+
+class Category(LowercaseSlugMixin, models.Model):
     """ Создаем  модель категорий
            под нужды проекта. """
     name = models.CharField(max_length=200, verbose_name='Категория')
@@ -40,7 +107,7 @@ class Category(models.Model):
         return self.name
 
 
-class Genre(models.Model):
+class Genre(LowercaseSlugMixin, models.Model):
     """ Создаем  модель жанров
            под нужды проекта. """
     name = models.CharField(max_length=200, verbose_name='Жанр')
@@ -54,6 +121,58 @@ class Genre(models.Model):
         return self.name
 
 
+class TitleQuerySet(models.QuerySet):
+    """ Операции над денормализованным рейтингом тайтлов. """
+
+    def touch(self):
+        """ Отмечает изменение тайтлов, их отзывов или комментариев:
+            по ревизии и времени изменения строятся ETag и
+            Last-Modified. """
+        return self.update(
+            revision=F('revision') + 1, modified=timezone.now()
+        )
+
+    def apply_score_delta(self, title_id, score_delta, count_delta):
+        """ Атомарно сдвигает сумму и количество оценок тайтла
+            одним UPDATE и пересчитывает рейтинг. """
+        new_sum = F('score_sum') + score_delta
+        new_count = F('score_count') + count_delta
+        return self.filter(pk=title_id).update(
+            revision=F('revision') + 1,
+            modified=timezone.now(),
+            score_sum=new_sum,
+            score_count=new_count,
+            rating=Case(
+                When(score_count__lte=-count_delta, then=Value(None)),
+                default=Cast(new_sum, FloatField()) / new_count,
+                output_field=FloatField(),
+            ),
+        )
+
+    def recalculate_ratings(self):
+        """ Пересчитывает рейтинг по отзывам с нуля. Возвращает
+            количество тайтлов, у которых рейтинг разошелся. """
+        fixed = 0
+        titles = self.annotate(
+            real_sum=Sum('reviews__score'),
+            real_count=Count('reviews'),
+            real_rating=Avg('reviews__score'),
+        ).only('id', 'score_sum', 'score_count', 'rating')
+        for title in titles.iterator():
+            real_sum = title.real_sum or 0
+            if (title.score_sum, title.score_count, title.rating) == (
+                real_sum, title.real_count, title.real_rating
+            ):
+                continue
+            self.model.objects.filter(pk=title.pk).update(
+                score_sum=real_sum,
+                score_count=title.real_count,
+                rating=title.real_rating,
+            )
+            fixed += 1
+        return fixed
+
+
 class Title(models.Model):
     """ Создаем  модель тайтлов
            под нужды проекта. """
@@ -76,13 +195,46 @@ class Title(models.Model):
                                  related_name='titles',
                                  verbose_name='Категория')
     rating = models.FloatField(null=True, blank=True)
+    score_sum = models.PositiveIntegerField(default=0,
+                                            verbose_name='Сумма оценок')
+    score_count = models.PositiveIntegerField(default=0,
+                                              verbose_name='Число оценок')
+    revision = models.PositiveIntegerField(default=0,
+                                           verbose_name='Ревизия')
+    modified = models.DateTimeField(default=timezone.now,
+                                    verbose_name='Дата изменения')
+
+    objects = TitleQuerySet.as_manager()
 
     class Meta:
         verbose_name_plural = 'Названия произведений'
+        indexes = [
+            models.Index(fields=['rating', 'id'], name='title_rating_idx'),
+            models.Index(fields=['category', 'year'],
+                         name='title_category_year_idx'),
+            models.Index(fields=['modified'], name='title_modified_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        """ Ревизия и время изменения пишутся тем же INSERT/UPDATE,
+            что и сам тайтл. Ревизия сдвигается в базе, чтобы два
+            одновременных сохранения не получили один номер. """
+        self.modified = timezone.now()
+        if not self._state.adding:
+            self.revision = F('revision') + 1
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'revision', 'modified'}
+        try:
+            super().save(*args, **kwargs)
+        finally:
+            if not isinstance(self.revision, int):
+                # Новое значение прочитается из базы при обращении.
+                del self.__dict__['revision']
+
 
 class Review(models.Model):
     """ Создаем  модель отзывов
@@ -111,6 +263,27 @@ class Review(models.Model):
                 name='Unique'
             )
         ]
+        indexes = [
+            models.Index(fields=['title', 'pub_date'],
+                         name='review_title_pub_date_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.remember_score()
+        return instance
+
+    def remember_score(self):
+        """ Запоминаем сохраненные в БД оценку и тайтл, чтобы при
+            обновлении сдвинуть рейтинг на разницу, а не пересчитывать. """
+        self._loaded_score = self.__dict__.get('score')
+        self._loaded_title_id = self.__dict__.get('title_id')
+
+    def save(self, *args, **kwargs):
+        # Отзыв и сдвиг рейтинга (сигнал post_save) пишутся вместе.
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
 
 
 class Comment(models.Model):
@@ -128,3 +301,94 @@ class Comment(models.Model):
         on_delete=models.CASCADE,
         related_name='comments'
     )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['review', 'pub_date'],
+                         name='comment_review_pub_date_idx'),
+        ]
+
+
+class ImportChecksum(models.Model):
+    """ Отпечатки строк CSV выгрузки для инкрементальной загрузки.
+        Строка с пустым key хранит отпечаток всей таблицы. """
+    table = models.CharField(max_length=50)
+    key = models.CharField(max_length=50, blank=True)
+    digest = models.CharField(max_length=32)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['table', 'key'],
+                name='unique_import_checksum'
+            )
+        ]
+        verbose_name_plural = 'Отпечатки выгрузки'
+
+
+class OutboxEmailQuerySet(models.QuerySet):
+    """ Очередь писем, которые отправляет команда send_outbox. """
+
+    def pending(self):
+        """ Неотправленные письма, попытки для которых не исчерпаны. """
+        return self.filter(sent_at__isnull=True, next_attempt_at__isnull=False)
+
+    def due(self, now=None):
+        """ Письма, время очередной попытки для которых наступило. """
+        return self.pending().filter(
+            next_attempt_at__lte=now or timezone.now()
+        )
+
+    def failed(self):
+        """ Письма, которые так и не удалось отправить. """
+        return self.filter(sent_at__isnull=True, next_attempt_at__isnull=True)
+
+
+class OutboxEmail(models.Model):
+    """ Письмо, записанное в той же транзакции, что и изменение
+        данных. Отправкой занимается отдельный процесс, поэтому
+        запрос не ждет почтовый сервер. """
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=254)
+    to = models.EmailField()
+    created = models.DateTimeField(auto_now_add=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now, null=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+
+    objects = OutboxEmailQuerySet.as_manager()
+
+    class Meta:
+        ordering = ('next_attempt_at', 'id')
+        indexes = [
+            models.Index(fields=['sent_at', 'next_attempt_at'],
+                         name='outbox_due_idx'),
+        ]
+        verbose_name_plural = 'Исходящие письма'
+
+    def __str__(self):
+        return f'{self.subject} -> {self.to}'
+
+
+class RevokedToken(models.Model):
+    """ Отозванный JWT по его jti. Строки нужны только до истечения
+        срока действия токена. """
+    jti = models.CharField(max_length=255, unique=True)
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='revoked_tokens'
+    )
+    expires_at = models.DateTimeField(db_index=True)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ('id',)
+        verbose_name_plural = 'Отозванные токены'
+
+    def __str__(self):
+        return self.jti
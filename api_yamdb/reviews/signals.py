@@ -0,0 +1,77 @@
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete)
+from django.db.models import Q
+from django.dispatch import receiver
+
+from .models import Category, Comment, Genre, Review, Title, User
+
+
+@receiver(post_save, sender=Review)
+def shift_rating_on_save(sender, instance, created, **kwargs):
+    """ Сдвигаем сумму и количество оценок тайтла на изменение отзыва. """
+    old_score = getattr(instance, '_loaded_score', None)
+    old_title_id = getattr(instance, '_loaded_title_id', None)
+    if created:
+        Title.objects.apply_score_delta(instance.title_id, instance.score, 1)
+    elif old_score is None or old_title_id is None:
+        # Старые значения неизвестны - пересчитываем тайтл целиком.
+        titles = Title.objects.filter(pk=instance.title_id)
+        titles.recalculate_ratings()
+        titles.touch()
+    elif old_title_id != instance.title_id:
+        Title.objects.apply_score_delta(old_title_id, -old_score, -1)
+        Title.objects.apply_score_delta(instance.title_id, instance.score, 1)
+    else:
+        # Даже без смены оценки сдвиг поднимет ревизию тайтла.
+        Title.objects.apply_score_delta(
+            instance.title_id, instance.score - old_score, 0
+        )
+    instance.remember_score()
+
+
+@receiver(post_delete, sender=Review)
+def shift_rating_on_delete(sender, instance, **kwargs):
+    """ Убираем оценку удаленного отзыва из рейтинга тайтла. """
+    Title.objects.apply_score_delta(instance.title_id, -instance.score, -1)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def touch_title_of_comment(sender, instance, **kwargs):
+    Title.objects.filter(reviews__id=instance.review_id).touch()
+
+
+@receiver(m2m_changed, sender=Title.genre.through)
+def touch_titles_of_genre_links(sender, instance, action, reverse, pk_set,
+                                **kwargs):
+    if not reverse:
+        if action.startswith('post_'):
+            Title.objects.filter(pk=instance.pk).touch()
+    elif action in ('post_add', 'post_remove'):
+        Title.objects.filter(pk__in=pk_set).touch()
+    elif action == 'pre_clear':
+        Title.objects.filter(genre=instance).touch()
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Genre)
+@receiver(pre_delete, sender=Category)
+@receiver(pre_delete, sender=Genre)
+def touch_titles_of_catalog(sender, instance, created=False, **kwargs):
+    """ Название категории и жанров входит в ответ о тайтле. """
+    if created:
+        return
+    field = 'category' if sender is Category else 'genre'
+    Title.objects.filter(**{field: instance}).touch()
+
+
+@receiver(post_save, sender=User)
+def touch_titles_of_author(sender, instance, created=False, **kwargs):
+    """ Имя автора входит в ответы об отзывах и комментариях.
+        Удаление пользователя удаляет их каскадом, и тайтлы отмечают
+        сигналы отзывов и комментариев. """
+    if created or not instance.username_changed:
+        return
+    Title.objects.filter(
+        Q(reviews__author=instance) | Q(reviews__comments__author=instance)
+    ).touch()
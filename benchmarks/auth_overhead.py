@@ -0,0 +1,74 @@
+"""
+Стоимость аутентификации одного запроса с JWT токеном.
+
+Запуск из корня репозитория:
+    python benchmarks/auth_overhead.py [--requests 20000]
+
+Скрипт создает временную базу SQLite с одним пользователем и
+сравнивает JWTAuthentication из simplejwt с CachedJWTAuthentication:
+для токена без claims роли и для RoleRefreshToken.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BASE_DIR, 'api_yamdb'))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'api_yamdb.settings')
+
+import django  # noqa: E402
+from django.conf import settings  # noqa: E402
+
+
+def measure(authentication, request, count):
+    authentication.authenticate(request)
+    started = time.perf_counter()
+    for _ in range(count):
+        authentication.authenticate(request)
+    return (time.perf_counter() - started) / count * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=20000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        settings.DATABASES['default']['NAME'] = os.path.join(tmp, 'bench.db')
+        django.setup()
+        from django.core.management import call_command
+        from rest_framework.test import APIRequestFactory
+        from rest_framework_simplejwt.authentication import JWTAuthentication
+        from rest_framework_simplejwt.tokens import AccessToken
+
+        from api.authentication import CachedJWTAuthentication
+        from api.tokens import RoleRefreshToken
+        from reviews.models import User
+
+        call_command('migrate', verbosity=0)
+        user = User.objects.create_user(
+            username='bench', email='bench@yamdb.fake', role='admin'
+        )
+        tokens = {
+            'plain token': str(AccessToken.for_user(user)),
+            'role token': str(RoleRefreshToken.for_user(user).access_token),
+        }
+        backends = {
+            'JWTAuthentication': JWTAuthentication(),
+            'CachedJWTAuthentication': CachedJWTAuthentication(),
+        }
+        factory = APIRequestFactory()
+        for token_name, token in tokens.items():
+            request = factory.get(
+                '/api/v1/titles/', HTTP_AUTHORIZATION=f'Bearer {token}'
+            )
+            for backend_name, backend in backends.items():
+                per_request = measure(backend, request, args.requests)
+                print(f'{token_name:12} {backend_name:24} '
+                      f'{per_request:8.1f} us/request')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""
+Подсказки /api/v1/autocomplete/ против фильтра /api/v1/titles/?name=.
+
+Запуск из корня репозитория:
+    python benchmarks/autocomplete.py [--titles 200000]
+
+Скрипт создает временную базу SQLite с тайтлами из случайных слов,
+печатает время сборки и размер индекса в памяти, среднее время
+поиска в самом индексе и время ответа обоих адресов на префиксы
+разной длины.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BASE_DIR, 'api_yamdb'))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'api_yamdb.settings')
+
+import django  # noqa: E402
+from django.conf import settings  # noqa: E402
+
+SYLLABLES = ('ша', 'му', 'ро', 'ке', 'ли', 'то', 'на', 'ви', 'до', 'сэ',
+             'пу', 'ля', 'зо', 'гри', 'бэн', 'тор', 'ма', 'ски', 'ер', 'ан')
+PREFIXES = ('ш', 'шаму', 'шамуро', 'шамуроке то', 'ш шамуро')
+
+
+def fill(count, batch_size=50000):
+    from django.db import connection, transaction
+
+    rng = random.Random(1)
+
+    def word():
+        return ''.join(rng.choices(SYLLABLES, k=rng.randint(2, 4)))
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        for start in range(1, count + 1, batch_size):
+            cursor.executemany(
+                'INSERT INTO reviews_title (id, name, description, year, '
+                'rating, score_sum, score_count, revision, modified) '
+                "VALUES (%s, %s, '', 2000, %s, 0, 0, 0, '2024-01-01')",
+                [(pk, ' '.join(word() for _ in range(rng.randint(1, 4)))
+                  .capitalize(), round(rng.uniform(1, 10), 2))
+                 for pk in range(start, min(start + batch_size, count + 1))],
+            )
+
+
+def timed(call, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        call()
+    return (time.perf_counter() - started) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--titles', type=int, default=200000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        settings.DATABASES['default']['NAME'] = os.path.join(tmp, 'bench.db')
+        settings.ALLOWED_HOSTS = ['*']
+        django.setup()
+        from django.core.management import call_command
+        from rest_framework.test import APIClient
+
+        from api.autocomplete import autocomplete, normalize
+        from reviews.models import User
+
+        call_command('migrate', verbosity=0)
+        fill(args.titles)
+
+        started = time.perf_counter()
+        autocomplete.refresh()
+        elapsed = time.perf_counter() - started
+        autocomplete.reset()
+        tracemalloc.start()
+        autocomplete.refresh()
+        size, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f'{args.titles} titles: index built in {elapsed:.1f} s, '
+              f'{size / 2 ** 20:.0f} MiB (peak {peak / 2 ** 20:.0f} MiB)')
+
+        client = APIClient()
+        # Ответы анонимам кэшируются, поэтому список тайтлов
+        # запрашивает пользователь.
+        user_client = APIClient()
+        user_client.force_authenticate(User.objects.create_user(
+            username='bench', email='bench@yamdb.fake'
+        ))
+        index = autocomplete.indexes['titles']
+        # Первый запрос загружает адреса и представления.
+        client.get('/api/v1/autocomplete/', {'q': 'ш'})
+        user_client.get('/api/v1/titles/', {'name': 'ш'})
+        for prefix in PREFIXES:
+            words = normalize(prefix)
+            # Число совпадений - без ограничения обхода по рейтингу.
+            max_scan, settings.AUTOCOMPLETE_MAX_SCAN = \
+                settings.AUTOCOMPLETE_MAX_SCAN, None
+            found = len(index.search(words, 10 ** 9))
+            settings.AUTOCOMPLETE_MAX_SCAN = max_scan
+            in_memory = timed(lambda: index.search(words, 10), 1000) * 1000
+            endpoint = timed(
+                lambda: client.get('/api/v1/autocomplete/', {'q': prefix}),
+                args.repeat,
+            )
+            name_filter = timed(
+                lambda: user_client.get('/api/v1/titles/', {'name': prefix}),
+                args.repeat,
+            )
+            print(f'q={prefix!r:15} {found:7} matches: index {in_memory:7.1f} '
+                  f'us, /autocomplete/ {endpoint:6.2f} ms, '
+                  f'/titles/?name= {name_filter:7.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
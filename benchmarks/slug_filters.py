@@ -0,0 +1,186 @@
+"""
+Список тайтлов с фильтром по slug категории и жанра: старые
+фильтры iexact через JOIN против точного id, подзапроса IN и
+коррелированного EXISTS, а также списки genre__in, genre__all,
+category__in и диапазон лет против отдельного запроса на каждое
+значение, как делали клиенты без этих фильтров.
+
+Запуск из корня репозитория:
+    python benchmarks/slug_filters.py [--titles 1000000]
+
+Скрипт создает временную базу SQLite, заполняет ее тайтлами с двумя
+жанрами у каждого, печатает планы запросов и среднее время COUNT(*)
+и первой страницы, как их делает список /api/v1/titles/.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BASE_DIR, 'api_yamdb'))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'api_yamdb.settings')
+
+import django  # noqa: E402
+from django.conf import settings  # noqa: E402
+
+CATEGORIES = 20
+GENRES = 50
+
+
+def fill(count, batch_size=50000):
+    from django.db import connection, transaction
+
+    from reviews.models import Category, Genre
+
+    Category.objects.bulk_create(
+        Category(name=f'Категория {n}', slug=f'category-{n}')
+        for n in range(CATEGORIES)
+    )
+    Genre.objects.bulk_create(
+        Genre(name=f'Жанр {n}', slug=f'genre-{n}') for n in range(GENRES)
+    )
+    category_ids = list(Category.objects.values_list('id', flat=True))
+    genre_ids = list(Genre.objects.values_list('id', flat=True))
+    rng = random.Random(1)
+    with transaction.atomic(), connection.cursor() as cursor:
+        for start in range(1, count + 1, batch_size):
+            ids = range(start, min(start + batch_size, count + 1))
+            cursor.executemany(
+                'INSERT INTO reviews_title (id, name, description, year, '
+                'category_id, score_sum, score_count, revision, modified) '
+                "VALUES (%s, %s, '', %s, %s, 0, 0, 0, '2024-01-01')",
+                [(pk, f'Тайтл {pk}', rng.randrange(1950, 2025),
+                  rng.choice(category_ids)) for pk in ids],
+            )
+            cursor.executemany(
+                'INSERT INTO reviews_title_genre (title_id, genre_id) '
+                'VALUES (%s, %s)',
+                [(pk, genre) for pk in ids
+                 for genre in rng.sample(genre_ids, 2)],
+            )
+
+
+def old_filter(queryset, params):
+    """ Фильтры до перехода на slug в нижнем регистре. """
+    if 'category' in params:
+        queryset = queryset.filter(category__slug__iexact=params['category'])
+    if 'genre' in params:
+        queryset = queryset.filter(
+            genre__slug__iexact=params['genre']
+        ).distinct()
+    return queryset
+
+
+def new_filter(queryset, params):
+    from api.filters import TitleFilter
+
+    return TitleFilter(params, queryset=queryset).qs
+
+
+def exists_filter(queryset, params):
+    """ Тот же фильтр, но жанр через коррелированный EXISTS. """
+    genre = params.get('genre')
+    queryset = new_filter(
+        queryset, {k: v for k, v in params.items() if k != 'genre'}
+    )
+    if genre is None:
+        return queryset
+    return queryset.extra(
+        where=['EXISTS (SELECT 1 FROM reviews_title_genre tg '
+               'JOIN reviews_genre g ON g.id = tg.genre_id '
+               'WHERE tg.title_id = reviews_title.id AND g.slug = %s)'],
+        params=[genre.lower()],
+    )
+
+
+def timed(queryset, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        queryset.count()
+        list(queryset.order_by('id')[:10])
+    return (time.perf_counter() - started) / repeat * 1000
+
+
+def fan_out(queryset, params):
+    """ Клиент без списковых фильтров: запрос на каждый жанр и год. """
+    querysets = []
+    for genre in params['genres']:
+        for year in params['years']:
+            querysets.append(new_filter(
+                queryset, {'genre': genre, 'year': year}
+            ))
+    return querysets
+
+
+def print_multi_value(repeat):
+    from reviews.models import Title
+
+    genres = ['genre-7', 'genre-8', 'genre-9']
+    years = range(1998, 2003)
+    params = {
+        'genre__in': ','.join(genres),
+        'year_min': years[0], 'year_max': years[-1],
+    }
+    print('== genre__in=3 genres & year_min/year_max (5 years)')
+    queryset = new_filter(Title.objects.all(), params)
+    print(f'-- one request   {timed(queryset, repeat):8.1f} ms')
+    querysets = fan_out(Title.objects.all(),
+                        {'genres': genres, 'years': years})
+    elapsed = sum(timed(queryset, repeat) for queryset in querysets)
+    print(f'-- {len(querysets)} requests {elapsed:9.1f} ms')
+    for line in queryset.order_by('id')[:10].explain().splitlines():
+        print(f'   {line}')
+
+    print('== genre__all=2 genres & category__in=2 categories')
+    queryset = new_filter(Title.objects.all(), {
+        'genre__all': 'genre-7,genre-8',
+        'category__in': 'category-3,category-4',
+    })
+    print(f'-- one request   {timed(queryset, repeat):8.1f} ms')
+    for line in queryset.order_by('id')[:10].explain().splitlines():
+        print(f'   {line}')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--titles', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        settings.DATABASES['default']['NAME'] = os.path.join(tmp, 'bench.db')
+        django.setup()
+        from django.core.management import call_command
+
+        from reviews.models import Title
+
+        call_command('migrate', verbosity=0)
+        started = time.perf_counter()
+        fill(args.titles)
+        print(f'{args.titles} titles loaded in '
+              f'{time.perf_counter() - started:.1f} s')
+
+        cases = {
+            'category': {'category': 'Category-3'},
+            'genre': {'genre': 'Genre-7'},
+            'category + genre': {'category': 'category-3', 'genre': 'genre-7'},
+        }
+        for name, params in cases.items():
+            print(f'== {name}')
+            variants = (('iexact', old_filter), ('exact, IN', new_filter),
+                        ('exact, EXISTS', exists_filter))
+            for label, build in variants:
+                queryset = build(Title.objects.all(), params)
+                plan = queryset.order_by('id')[:10].explain()
+                elapsed = timed(queryset, args.repeat)
+                print(f'-- {label:13} {elapsed:8.1f} ms (count + first page)')
+                for line in plan.splitlines():
+                    print(f'   {line}')
+        print_multi_value(args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+"""
+Пропускная способность эндпоинтов отзывов при одновременных чтении
+и записи в SQLite: со стандартными настройками и с SQLITE_PRAGMAS
+и SQLITE_TRANSACTION_MODE.
+
+Запуск из корня репозитория:
+    python benchmarks/sqlite_concurrency.py [--readers 8] [--writers 2]
+                                            [--seconds 5]
+
+Для каждого режима скрипт создает временную базу в файле, заводит
+тайтлы и пользователей, затем потоки-читатели запрашивают
+GET /api/v1/titles/<id>/reviews/, а потоки-писатели публикуют и
+удаляют отзывы через POST/DELETE. Печатается число успешных запросов
+в секунду и число ошибок (в том числе "database is locked").
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BASE_DIR, 'api_yamdb'))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'api_yamdb.settings')
+
+import django  # noqa: E402
+from django.conf import settings  # noqa: E402
+
+TITLES = 20
+
+
+def prepare():
+    from django.core.management import call_command
+
+    from reviews.models import Category, Title, User
+
+    call_command('migrate', verbosity=0)
+    category = Category.objects.create(name='Фильм', slug='movie')
+    Title.objects.bulk_create(
+        Title(name=f'Тайтл {number}', year=2000, category=category)
+        for number in range(TITLES)
+    )
+    return list(Title.objects.values_list('id', flat=True)), User
+
+
+def reader(title_ids, stop, stats):
+    from django.db import connection
+    from rest_framework.test import APIClient
+
+    client = APIClient()
+    number = 0
+    while not stop.is_set():
+        title_id = title_ids[number % len(title_ids)]
+        number += 1
+        try:
+            response = client.get(f'/api/v1/titles/{title_id}/reviews/')
+            stats['reads' if response.status_code == 200 else 'errors'] += 1
+        except Exception:
+            stats['errors'] += 1
+    connection.close()
+
+
+def writer(user, title_ids, stop, stats):
+    from django.db import connection
+    from rest_framework.test import APIClient
+    from rest_framework_simplejwt.tokens import AccessToken
+
+    client = APIClient()
+    client.credentials(
+        HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}'
+    )
+    number = 0
+    while not stop.is_set():
+        title_id = title_ids[number % len(title_ids)]
+        number += 1
+        url = f'/api/v1/titles/{title_id}/reviews/'
+        try:
+            response = client.post(url, data={'text': 'Отзыв', 'score': 7})
+            if response.status_code != 201:
+                stats['errors'] += 1
+                continue
+            review_id = response.json()['id']
+            response = client.delete(f'{url}{review_id}/')
+            stats['writes' if response.status_code == 204 else 'errors'] += 2
+        except Exception:
+            stats['errors'] += 1
+    connection.close()
+
+
+def run(mode, pragmas, transaction_mode, args):
+    from django.db import connections
+
+    settings.SQLITE_PRAGMAS = pragmas
+    settings.SQLITE_TRANSACTION_MODE = transaction_mode
+    connections.close_all()
+    with tempfile.TemporaryDirectory() as tmp:
+        settings.DATABASES['default']['NAME'] = os.path.join(tmp, 'bench.db')
+        title_ids, User = prepare()
+        users = [
+            User.objects.create_user(
+                username=f'writer{number}', email=f'w{number}@yamdb.fake'
+            )
+            for number in range(args.writers)
+        ]
+        connections.close_all()
+        stop = threading.Event()
+        stats = {'reads': 0, 'writes': 0, 'errors': 0}
+        threads = [
+            threading.Thread(target=reader, args=(title_ids, stop, stats))
+            for _ in range(args.readers)
+        ] + [
+            threading.Thread(
+                target=writer, args=(user, title_ids, stop, stats)
+            )
+            for user in users
+        ]
+        for thread in threads:
+            thread.start()
+        time.sleep(args.seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        connections.close_all()
+    print(f'{mode:10} reads/s {stats["reads"] / args.seconds:8.1f}   '
+          f'writes/s {stats["writes"] / args.seconds:8.1f}   '
+          f'errors {stats["errors"]}')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--seconds', type=float, default=5)
+    args = parser.parse_args()
+
+    tuned = dict(settings.SQLITE_PRAGMAS)
+    transaction_mode = settings.SQLITE_TRANSACTION_MODE
+    django.setup()
+    run('stock', {}, '', args)
+    run('tuned', tuned, transaction_mode, args)
+
+
+if __name__ == '__main__':
+    main()
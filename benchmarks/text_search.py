@@ -0,0 +1,123 @@
+"""
+Время ответа поиска модератора по текстам отзывов.
+
+Запуск из корня репозитория:
+    python benchmarks/text_search.py [--reviews 200000]
+
+Скрипт создает временную базу SQLite, заполняет ее отзывами из
+случайных слов (индекс FTS5 наполняют триггеры), печатает план
+запроса и среднее время первой и глубокой страницы для частого
+слова, редкого слова и запроса с фильтрами.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BASE_DIR, 'api_yamdb'))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'api_yamdb.settings')
+
+import django  # noqa: E402
+from django.conf import settings  # noqa: E402
+
+WORDS = ('фильм', 'сюжет', 'актер', 'режиссер', 'музыка', 'финал', 'герой',
+         'скучно', 'отлично', 'смотреть', 'книга', 'сцена', 'камера')
+
+
+def fill(count, batch_size=10000):
+    from django.db import transaction
+
+    from reviews.models import Category, Review, Title, User
+
+    rng = random.Random(1)
+    category = Category.objects.create(name='Фильм', slug='movie')
+    Title.objects.bulk_create(
+        Title(name=f'Тайтл {n}', year=2000, category=category)
+        for n in range(1000)
+    )
+    User.objects.bulk_create(
+        User(username=f'user{n}', email=f'user{n}@yamdb.fake')
+        for n in range(count // 1000 + 1)
+    )
+    title_ids = list(Title.objects.values_list('id', flat=True))
+    user_ids = list(User.objects.values_list('id', flat=True))
+    with transaction.atomic():
+        for start in range(0, count, batch_size):
+            reviews = []
+            for number in range(start, min(start + batch_size, count)):
+                words = rng.choices(WORDS, k=12)
+                if number % 10000 == 0:
+                    words.append('спойлер')
+                # Один отзыв пользователя на тайтл, как требует модель.
+                reviews.append(Review(
+                    title_id=title_ids[number % len(title_ids)],
+                    author_id=user_ids[number // len(title_ids)],
+                    text=' '.join(words), score=5,
+                ))
+            Review.objects.bulk_create(reviews)
+
+
+def timed(client, params, repeat=20):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        response = client.get('/api/v1/moderation/search/', params)
+    elapsed = (time.perf_counter() - started) / repeat * 1000
+    return elapsed, response.json()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--reviews', type=int, default=200000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        settings.DATABASES['default']['NAME'] = os.path.join(tmp, 'bench.db')
+        django.setup()
+        from django.core.management import call_command
+        from rest_framework.test import APIClient
+
+        from api.filters import text_search
+        from reviews.models import Review, User
+
+        call_command('migrate', verbosity=0)
+        started = time.perf_counter()
+        fill(args.reviews)
+        print(f'{args.reviews} reviews loaded in '
+              f'{time.perf_counter() - started:.1f} s')
+
+        queryset, column = text_search(Review.objects.all(), 'финал')
+        print(queryset.extra(order_by=[f'-{column}'])[:11].explain())
+
+        moderator = User.objects.create_user(
+            username='moderator', email='moderator@yamdb.fake',
+            role='moderator'
+        )
+        client = APIClient()
+        client.force_authenticate(moderator)
+        cases = {
+            'common word': {'q': 'финал'},
+            'two words': {'q': 'финал музык'},
+            'rare word': {'q': 'спойлер'},
+            'word + title': {'q': 'финал', 'title': 1},
+            'word + author': {'q': 'финал', 'author': 'user7'},
+        }
+        for name, params in cases.items():
+            first, page = timed(client, params)
+            deep = ''
+            if page.get('next'):
+                for _ in range(50):
+                    if not page['next']:
+                        break
+                    page = client.get(page['next']).json()
+                if page.get('next'):
+                    cursor = page['next'].split('cursor=')[1].split('&')[0]
+                    elapsed, _ = timed(client, {**params, 'cursor': cursor})
+                    deep = f', page 51: {elapsed:6.1f} ms'
+            print(f'{name:14} first page: {first:6.1f} ms{deep}')
+
+
+if __name__ == '__main__':
+    main()
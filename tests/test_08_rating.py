@@ -0,0 +1,77 @@
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from reviews.models import Review, Title
+
+from .common import (auth_client, create_categories, create_genre,
+                     create_reviews, create_users_api)
+
+
+class Test08TitleRating:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_rating_follows_reviews(self, admin_client, admin):
+        reviews, titles, user, moderator = create_reviews(admin_client, admin)
+        title_id = titles[0]['id']
+        title = Title.objects.get(pk=title_id)
+        assert (title.score_sum, title.score_count, title.rating) == (12, 3, 4), (
+            'Проверьте, что при создании отзыва обновляются сумма, количество оценок и `rating` тайтла'
+        )
+
+        admin_client.patch(f'/api/v1/titles/{title_id}/reviews/{reviews[0]["id"]}/', data={'score': 8})
+        response = admin_client.get(f'/api/v1/titles/{title_id}/')
+        assert response.json().get('rating') == 5, (
+            'Проверьте, что при изменении оценки отзыва пересчитывается `rating` тайтла'
+        )
+
+        admin_client.delete(f'/api/v1/titles/{title_id}/reviews/{reviews[1]["id"]}/')
+        response = admin_client.get(f'/api/v1/titles/{title_id}/')
+        assert response.json().get('rating') == 6, (
+            'Проверьте, что при удалении отзыва пересчитывается `rating` тайтла'
+        )
+
+        Review.objects.filter(title_id=title_id).delete()
+        title.refresh_from_db()
+        assert (title.score_sum, title.score_count, title.rating) == (0, 0, None), (
+            'Проверьте, что без отзывов `rating` тайтла равен `None`'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_recalculate_ratings(self, admin_client, admin):
+        _, titles, _, _ = create_reviews(admin_client, admin)
+        Title.objects.update(score_sum=0, score_count=0, rating=None)
+        call_command('recalculate_ratings')
+        title = Title.objects.get(pk=titles[0]['id'])
+        assert (title.score_sum, title.score_count, title.rating) == (12, 3, 4), (
+            'Проверьте, что команда `recalculate_ratings` восстанавливает рейтинг по отзывам'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_03_title_list_skips_reviews(self, admin_client, client):
+        genres = create_genre(admin_client)
+        categories = create_categories(admin_client)
+        user, moderator = create_users_api(admin_client)
+        clients = [admin_client, auth_client(user), auth_client(moderator)]
+        for number in range(10):
+            response = admin_client.post('/api/v1/titles/', data={
+                'name': f'Тайтл {number}', 'year': 2000,
+                'genre': [genres[0]['slug']], 'category': categories[0]['slug']
+            })
+            for score, uclient in enumerate(clients, start=1):
+                uclient.post(f'/api/v1/titles/{response.json()["id"]}/reviews/',
+                             data={'text': 'text', 'score': score})
+
+        with CaptureQueriesContext(connection) as context:
+            response = client.get('/api/v1/titles/')
+        assert len(response.json()['results']) == 10
+        assert all(title['rating'] == 2 for title in response.json()['results'])
+        review_queries = [
+            query['sql'] for query in context.captured_queries
+            if Review._meta.db_table in query['sql']
+        ]
+        assert not review_queries, (
+            'Проверьте, что при GET запросе `/api/v1/titles/` рейтинг читается из тайтла, '
+            'а не считается по отзывам для каждой строки'
+        )
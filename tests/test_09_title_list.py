@@ -0,0 +1,81 @@
+import pytest
+
+from .common import create_categories, create_genre
+
+
+def create_many_titles(admin_client, count):
+    genres = create_genre(admin_client)
+    categories = create_categories(admin_client)
+    for number in range(count):
+        data = {
+            'name': f'Тайтл {number}',
+            'year': 1990 + number,
+            'genre': [genres[number % 3]['slug'], genres[(number + 1) % 3]['slug']],
+            'category': categories[number % 2]['slug'],
+        }
+        admin_client.post('/api/v1/titles/', data=data)
+    return genres, categories
+
+
+class Test09TitleList:
+
+    @pytest.mark.django_db(transaction=True)
+    @pytest.mark.parametrize('query', [
+        '',
+        '?genre=horror',
+        '?category=films',
+        '?category=films&genre=comedy&year=1990',
+        '?name=Тайтл',
+    ])
+    def test_01_title_list_query_budget(self, admin_client, client, django_assert_max_num_queries, query):
+        create_many_titles(admin_client, 15)
+        with django_assert_max_num_queries(3):
+            response = client.get(f'/api/v1/titles/{query}')
+        assert response.status_code == 200
+        for title in response.json()['results']:
+            assert title['category'] and title['genre'], (
+                'Проверьте, что при GET запросе `/api/v1/titles/` возвращаются категория и жанры тайтла'
+            )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_title_query_budget_does_not_grow(self, admin_client, client, django_assert_num_queries):
+        create_many_titles(admin_client, 2)
+        with django_assert_num_queries(3):
+            client.get('/api/v1/titles/')
+        for number in range(10):
+            admin_client.post('/api/v1/titles/', data={'name': f'Ещё {number}', 'year': 2001,
+                                                       'genre': ['horror', 'drama'], 'category': 'books'})
+        with django_assert_num_queries(3):
+            response = client.get('/api/v1/titles/')
+        assert len(response.json()['results']) == 10
+        title_id = response.json()['results'][0]['id']
+        # Штамп версии для ETag, тайтл с категорией и жанры.
+        with django_assert_num_queries(3):
+            client.get(f'/api/v1/titles/{title_id}/')
+
+    @pytest.mark.django_db(transaction=True)
+    def test_03_title_rating_ordering_and_range(self, admin_client, client):
+        create_many_titles(admin_client, 4)
+        titles = client.get('/api/v1/titles/?ordering=year').json()['results']
+        for title, score in zip(titles, (3, 9, 6)):
+            admin_client.post(f'/api/v1/titles/{title["id"]}/reviews/', data={'text': 'text', 'score': score})
+
+        response = client.get('/api/v1/titles/?ordering=-rating')
+        assert [title['rating'] for title in response.json()['results']] == [9, 6, 3, None], (
+            'Проверьте, что GET запрос `/api/v1/titles/?ordering=-rating` сортирует тайтлы по убыванию рейтинга'
+        )
+        response = client.get('/api/v1/titles/?ordering=rating')
+        assert [title['rating'] for title in response.json()['results']] == [3, 6, 9, None], (
+            'Проверьте, что тайтлы без рейтинга идут последними и при сортировке по возрастанию'
+        )
+        response = client.get('/api/v1/titles/?ordering=-year')
+        assert [title['year'] for title in response.json()['results']] == [1993, 1992, 1991, 1990]
+
+        response = client.get('/api/v1/titles/?rating_min=5&ordering=rating')
+        assert [title['rating'] for title in response.json()['results']] == [6, 9], (
+            'Проверьте, что GET запрос `/api/v1/titles/?rating_min=` отбирает тайтлы по нижней границе рейтинга'
+        )
+        response = client.get('/api/v1/titles/?rating_min=3&rating_max=6')
+        assert sorted(title['rating'] for title in response.json()['results']) == [3, 6], (
+            'Проверьте, что GET запрос `/api/v1/titles/?rating_max=` отбирает тайтлы по верхней границе рейтинга'
+        )
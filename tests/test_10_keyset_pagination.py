@@ -0,0 +1,63 @@
+import pytest
+
+from .common import auth_client, create_reviews
+
+
+class Test10KeysetPagination:
+
+    def collect(self, client, url):
+        pages = []
+        while url:
+            response = client.get(url)
+            assert response.status_code == 200
+            data = response.json()
+            assert 'count' not in data, (
+                'Проверьте, что при пагинации по ключу `?cursor=` не считается `count`'
+            )
+            pages.append(data)
+            url = data['next']
+        return pages
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_reviews_cursor(self, admin_client, admin, django_user_model, client):
+        reviews, titles, _, _ = create_reviews(admin_client, admin)
+        title_id = titles[0]['id']
+        for number in range(20):
+            user = django_user_model.objects.create_user(
+                username=f'reader{number}', email=f'reader{number}@yamdb.fake'
+            )
+            auth_client(user).post(f'/api/v1/titles/{title_id}/reviews/', data={'text': 'text', 'score': 5})
+
+        response = client.get(f'/api/v1/titles/{title_id}/reviews/')
+        assert response.json()['count'] == 23, (
+            'Проверьте, что без `?cursor=` `/api/v1/titles/{title_id}/reviews/` отдается постранично с `count`'
+        )
+
+        pages = self.collect(client, f'/api/v1/titles/{title_id}/reviews/?cursor=')
+        assert [len(page['results']) for page in pages] == [10, 10, 3]
+        ids = [review['id'] for page in pages for review in page['results']]
+        assert ids == sorted(ids, reverse=True), (
+            'Проверьте, что при `?cursor=` отзывы отдаются от новых к старым без пропусков и повторов'
+        )
+        assert pages[0]['previous'] is None
+
+        previous = client.get(pages[2]['previous']).json()
+        assert previous['results'] == pages[1]['results'], (
+            'Проверьте, что ссылка `previous` ведет на предыдущую страницу'
+        )
+
+        response = client.get(f'/api/v1/titles/{title_id}/reviews/?cursor=broken')
+        assert response.status_code == 404
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_comments_cursor(self, admin_client, admin, client):
+        reviews, titles, _, _ = create_reviews(admin_client, admin)
+        url = f'/api/v1/titles/{titles[0]["id"]}/reviews/{reviews[0]["id"]}/comments/'
+        for number in range(12):
+            admin_client.post(url, data={'text': f'comment {number}'})
+
+        pages = self.collect(client, f'{url}?cursor=')
+        texts = [comment['text'] for page in pages for comment in page['results']]
+        assert texts == [f'comment {number}' for number in reversed(range(12))], (
+            'Проверьте, что при `?cursor=` комментарии отдаются от новых к старым'
+        )
@@ -0,0 +1,83 @@
+import pytest
+from django.db import connection
+
+from reviews.models import Category
+
+from .common import create_categories, create_titles
+
+
+class Test11CachedCount:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_count_is_cached_until_write(self, admin_client, client, django_assert_num_queries):
+        titles, _, genres = create_titles(admin_client)
+        with django_assert_num_queries(3):
+            response = client.get('/api/v1/titles/')
+        assert response.json()['count'] == 2
+        with django_assert_num_queries(2):
+            response = client.get('/api/v1/titles/?page=1')
+        assert response.json()['count'] == 2, (
+            'Проверьте, что повторный GET запрос `/api/v1/titles/` берет `count` из кэша'
+        )
+
+        response = client.get(f'/api/v1/titles/?genre={genres[2]["slug"]}')
+        assert response.json()['count'] == 1, (
+            'Проверьте, что `count` кэшируется отдельно для разных параметров фильтрации'
+        )
+
+        admin_client.patch(f'/api/v1/titles/{titles[0]["id"]}/', data={'genre': [genres[2]['slug']]})
+        response = client.get(f'/api/v1/titles/?genre={genres[2]["slug"]}')
+        assert response.json()['count'] == 2, (
+            'Проверьте, что изменение жанров тайтла сбрасывает кэш `count`'
+        )
+        admin_client.delete(f'/api/v1/titles/{titles[1]["id"]}/')
+        response = client.get('/api/v1/titles/')
+        assert response.json()['count'] == 1, (
+            'Проверьте, что удаление тайтла сбрасывает кэш `count`'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_estimated_count(self, admin_client, client, settings):
+        if connection.vendor != 'sqlite':
+            pytest.skip('sqlite_stat1 есть только у SQLite')
+        categories = create_categories(admin_client)
+        admin_client.delete(f'/api/v1/categories/{categories[0]["slug"]}/')
+        assert client.get('/api/v1/categories/').json()['count'] == 1
+
+        settings.PAGINATION_ESTIMATED_COUNT_THRESHOLD = 0
+        admin_client.post('/api/v1/categories/', data={'name': 'Музыка', 'slug': 'music'})
+        assert client.get('/api/v1/categories/').json()['count'] == 2, (
+            'Проверьте, что без статистики базы `count` считается точно'
+        )
+
+        admin_client.post('/api/v1/categories/', data={'name': 'Кино', 'slug': 'cinema'})
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+            cursor.execute("UPDATE sqlite_stat1 SET stat = '1000 1' WHERE tbl = 'reviews_category'")
+            cursor.execute('ANALYZE sqlite_master')
+        admin_client.post('/api/v1/categories/', data={'name': 'Игры', 'slug': 'games'})
+        assert client.get('/api/v1/categories/').json()['count'] == 1000, (
+            'Проверьте, что для больших таблиц без фильтров `count` берется из статистики базы'
+        )
+        assert client.get('/api/v1/categories/?search=Муз').json()['count'] == 1, (
+            'Проверьте, что для выборок с фильтрами `count` считается точно'
+        )
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM sqlite_stat1')
+
+    @pytest.mark.django_db(transaction=True)
+    def test_03_estimated_count_postgresql(self, admin_client, client, settings):
+        if connection.vendor != 'postgresql':
+            pytest.skip('pg_class есть только у PostgreSQL')
+        create_categories(admin_client)
+        settings.PAGINATION_ESTIMATED_COUNT_THRESHOLD = 1
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE reviews_category')
+        # Оценка отстает от таблицы до следующего ANALYZE.
+        admin_client.post('/api/v1/categories/', data={'name': 'Музыка', 'slug': 'music'})
+        assert client.get('/api/v1/categories/').json()['count'] == 2, (
+            'Проверьте, что для больших таблиц без фильтров `count` берется из pg_class.reltuples'
+        )
+        assert client.get('/api/v1/categories/?search=Муз').json()['count'] == 1, (
+            'Проверьте, что для выборок с фильтрами `count` считается точно'
+        )
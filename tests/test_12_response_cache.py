@@ -0,0 +1,70 @@
+import pytest
+from django.db import transaction
+
+from api.caching import get_versions
+from reviews.models import Category
+
+from .common import create_titles
+
+
+class Test12ResponseCache:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_anonymous_get_is_cached(self, admin_client, client, django_assert_num_queries):
+        titles, _, _ = create_titles(admin_client)
+        for url in ('/api/v1/titles/', f'/api/v1/titles/{titles[0]["id"]}/',
+                    '/api/v1/categories/', '/api/v1/genres/?search=Ужас'):
+            first = client.get(url)
+            with django_assert_num_queries(0):
+                second = client.get(url)
+            assert first.json() == second.json(), (
+                f'Проверьте, что анонимный GET запрос `{url}` повторно отдается из кэша'
+            )
+
+        response = admin_client.get('/api/v1/titles/')
+        assert response.status_code == 200
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_writes_invalidate_cache(self, admin_client, client):
+        titles, categories, genres = create_titles(admin_client)
+        url = f'/api/v1/titles/{titles[0]["id"]}/'
+        assert client.get(url).json()['rating'] is None
+
+        admin_client.post(f'{url}reviews/', data={'text': 'text', 'score': 7})
+        assert client.get(url).json()['rating'] == 7, (
+            'Проверьте, что новый отзыв сбрасывает кэш тайтла'
+        )
+
+        admin_client.delete(f'/api/v1/genres/{genres[0]["slug"]}/')
+        slugs = [genre['slug'] for genre in client.get(url).json()['genre']]
+        assert genres[0]['slug'] not in slugs, (
+            'Проверьте, что удаление жанра сбрасывает кэш тайтлов'
+        )
+        response = client.get('/api/v1/genres/')
+        assert response.json()['count'] == 2
+
+        admin_client.patch(url, data={'category': categories[1]['slug']})
+        assert client.get(url).json()['category']['slug'] == categories[1]['slug'], (
+            'Проверьте, что изменение тайтла сбрасывает кэш тайтла'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_03_version_changes_after_commit(self):
+        before = get_versions((Category,))
+        with transaction.atomic():
+            Category.objects.create(name='Фильм', slug='films')
+            assert get_versions((Category,)) == before, (
+                'Проверьте, что версия модели не меняется до фиксации транзакции: '
+                'иначе в кэш под новым ключом попадут старые данные'
+            )
+        assert get_versions((Category,)) != before
+
+    @pytest.mark.django_db(transaction=True)
+    def test_04_repeated_params_keep_order(self, admin_client, client):
+        create_titles(admin_client)
+        first = client.get('/api/v1/titles/?ordering=year&ordering=-year').json()['results']
+        second = client.get('/api/v1/titles/?ordering=-year&ordering=year').json()['results']
+        assert [title['year'] for title in first] == [2020, 2000]
+        assert [title['year'] for title in second] == [2000, 2020], (
+            'Проверьте, что порядок значений повторенного параметра входит в ключ кэша ответов'
+        )
@@ -0,0 +1,138 @@
+from datetime import timedelta
+
+import pytest
+from django.utils import timezone
+
+from reviews.models import Title
+
+from .common import create_reviews
+
+
+class Test13ConditionalGet:
+
+    def assert_conditional(self, client, url, django_assert_max_num_queries):
+        response = client.get(url)
+        etag = response.get('ETag')
+        assert response.status_code == 200 and etag, (
+            f'Проверьте, что GET запрос `{url}` возвращает заголовок `ETag`'
+        )
+        # Не больше загрузки пользователя по токену и штампа версии.
+        with django_assert_max_num_queries(2):
+            response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304, (
+            f'Проверьте, что GET запрос `{url}` с совпадающим `If-None-Match` возвращает статус 304'
+        )
+        return etag
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_title_etag(self, admin_client, admin, user_client, django_assert_max_num_queries):
+        reviews, titles, _, _ = create_reviews(admin_client, admin)
+        url = f'/api/v1/titles/{titles[0]["id"]}/'
+        etag = self.assert_conditional(user_client, url, django_assert_max_num_queries)
+        assert not user_client.get(url).has_header('Last-Modified'), (
+            'Проверьте, что тайтл, измененный в текущую секунду, отдается без `Last-Modified`'
+        )
+        Title.objects.filter(pk=titles[0]['id']).update(
+            modified=timezone.now() - timedelta(seconds=5)
+        )
+        last_modified = user_client.get(url)['Last-Modified']
+        response = user_client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        assert response.status_code == 304, (
+            'Проверьте, что GET запрос `/api/v1/titles/{title_id}/` с `If-Modified-Since` возвращает статус 304'
+        )
+
+        admin_client.patch(f'{url}reviews/{reviews[0]["id"]}/', data={'score': 10})
+        response = user_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200 and response.json()['rating'] == 17 / 3, (
+            'Проверьте, что изменение отзыва меняет `ETag` тайтла'
+        )
+        self.assert_conditional(user_client, '/api/v1/titles/?genre=horror', django_assert_max_num_queries)
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_reviews_and_comments_etag(self, admin_client, admin, user_client, django_assert_max_num_queries):
+        reviews, titles, _, _ = create_reviews(admin_client, admin)
+        reviews_url = f'/api/v1/titles/{titles[0]["id"]}/reviews/'
+        comments_url = f'{reviews_url}{reviews[0]["id"]}/comments/'
+        reviews_etag = self.assert_conditional(user_client, reviews_url, django_assert_max_num_queries)
+        comments_etag = self.assert_conditional(user_client, comments_url, django_assert_max_num_queries)
+        self.assert_conditional(user_client, f'{reviews_url}{reviews[1]["id"]}/', django_assert_max_num_queries)
+
+        admin_client.post(comments_url, data={'text': 'новый комментарий'})
+        response = user_client.get(comments_url, HTTP_IF_NONE_MATCH=comments_etag)
+        assert response.status_code == 200 and response.json()['count'] == 1, (
+            'Проверьте, что новый комментарий меняет `ETag` списка комментариев'
+        )
+        admin_client.patch(f'{reviews_url}{reviews[0]["id"]}/', data={'text': 'новый текст'})
+        response = user_client.get(reviews_url, HTTP_IF_NONE_MATCH=reviews_etag)
+        assert response.status_code == 200, (
+            'Проверьте, что изменение текста отзыва меняет `ETag` списка отзывов'
+        )
+        response = user_client.get(f'/api/v1/titles/{titles[0]["id"]}/reviews/999/comments/')
+        assert response.status_code == 404
+
+    @pytest.mark.django_db(transaction=True)
+    def test_03_anonymous_conditional_from_cache(self, admin_client, admin, client, django_assert_num_queries):
+        _, titles, _, _ = create_reviews(admin_client, admin)
+        url = f'/api/v1/titles/{titles[0]["id"]}/'
+        etag = client.get(url)['ETag']
+        with django_assert_num_queries(0):
+            response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304 and response['ETag'] == etag, (
+            'Проверьте, что анонимный условный GET запрос получает 304 из кэша ответов'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_04_author_rename_changes_etag(self, admin_client, admin, user_client):
+        reviews, titles, _, _ = create_reviews(admin_client, admin)
+        reviews_url = f'/api/v1/titles/{titles[0]["id"]}/reviews/'
+        comments_url = f'{reviews_url}{reviews[0]["id"]}/comments/'
+        admin_client.post(comments_url, data={'text': 'комментарий'})
+        reviews_etag = user_client.get(reviews_url)['ETag']
+        comments_etag = user_client.get(comments_url)['ETag']
+
+        admin.username = 'renamed_admin'
+        admin.save()
+        response = user_client.get(reviews_url, HTTP_IF_NONE_MATCH=reviews_etag)
+        assert response.status_code == 200, (
+            'Проверьте, что смена имени автора меняет `ETag` списка отзывов'
+        )
+        response = user_client.get(comments_url, HTTP_IF_NONE_MATCH=comments_etag)
+        assert response.status_code == 200, (
+            'Проверьте, что смена имени автора меняет `ETag` списка комментариев'
+        )
+        assert response.json()['results'][0]['author'] == 'renamed_admin'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_05_default_stamp_and_single_update(self, django_assert_num_queries):
+        from rest_framework import mixins, viewsets
+        from rest_framework.permissions import AllowAny
+        from rest_framework.test import APIRequestFactory
+
+        from api.mixins import ConditionalGetMixin
+        from api.serializers import TitleListSerializer
+
+        class StampedViewSet(ConditionalGetMixin, mixins.ListModelMixin, viewsets.GenericViewSet):
+            queryset = Title.objects.all()
+            serializer_class = TitleListSerializer
+            permission_classes = (AllowAny,)
+            pagination_class = None
+
+        title = Title.objects.create(name='Тайтл', year=2000)
+        Title.objects.filter(pk=title.pk).update(modified=timezone.now() - timedelta(seconds=5))
+        view = StampedViewSet.as_view({'get': 'list'})
+        factory = APIRequestFactory()
+        response = view(factory.get('/stamped/'))
+        etag = response['ETag']
+        assert response.status_code == 200 and etag and response.has_header('Last-Modified'), (
+            'Проверьте, что get_version_stamp() по умолчанию строит штамп по полю modified'
+        )
+        assert view(factory.get('/stamped/', HTTP_IF_NONE_MATCH=etag)).status_code == 304
+
+        with django_assert_num_queries(1):
+            title.name = 'Новое название'
+            title.save()
+        title.refresh_from_db()
+        assert title.revision == 1, 'Проверьте, что сохранение тайтла сдвигает его ревизию'
+        assert view(factory.get('/stamped/', HTTP_IF_NONE_MATCH=etag)).status_code == 200, (
+            'Проверьте, что сохранение тайтла меняет штамп по умолчанию'
+        )
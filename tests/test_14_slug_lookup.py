@@ -0,0 +1,98 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from api.lookups import genre_slugs
+
+from .common import create_categories, create_genre
+
+
+class Test14SlugLookup:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_title_write_resolves_slugs_in_memory(self, admin_client):
+        genres = create_genre(admin_client)
+        categories = create_categories(admin_client)
+        data = {'name': 'Поворот туда', 'year': 2000, 'genre': [genre['slug'] for genre in genres],
+                'category': categories[0]['slug']}
+        admin_client.post('/api/v1/titles/', data=data)
+
+        with CaptureQueriesContext(connection) as context:
+            response = admin_client.post('/api/v1/titles/', data=data)
+        assert response.status_code == 201
+        assert response.json()['category'] == categories[0]['slug']
+        assert sorted(response.json()['genre']) == sorted(genre['slug'] for genre in genres)
+        lookups = [
+            query['sql'] for query in context.captured_queries
+            if '"reviews_genre"."slug" =' in query['sql'] or '"reviews_category"."slug" =' in query['sql']
+        ]
+        assert not lookups, (
+            'Проверьте, что при POST запросе `/api/v1/titles/` slug жанров и категории '
+            'не ищутся в базе по одному'
+        )
+        checks = [
+            query['sql'] for query in context.captured_queries
+            if '"reviews_category"."id" IN' in query['sql'] or '"reviews_genre"."id" IN' in query['sql']
+        ]
+        assert len(checks) == 1 and 'UNION ALL' in checks[0], (
+            'Проверьте, что id категории и жанров сверяются с базой одним запросом'
+        )
+
+        response = admin_client.post('/api/v1/titles/', data={**data, 'genre': ['unknown']})
+        assert response.status_code == 400
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_slug_filters_follow_writes(self, admin_client, client):
+        genres = create_genre(admin_client)
+        categories = create_categories(admin_client)
+        admin_client.post('/api/v1/titles/', data={'name': 'Тайтл', 'year': 2000, 'genre': [genres[0]['slug']],
+                                                   'category': categories[0]['slug']})
+        assert client.get('/api/v1/titles/?genre=HORROR&category=Films').json()['count'] == 1
+        assert client.get('/api/v1/titles/?genre=missing').json()['count'] == 0
+
+        admin_client.post('/api/v1/genres/', data={'name': 'Вестерн', 'slug': 'western'})
+        response = admin_client.post('/api/v1/titles/', data={'name': 'Ещё', 'year': 2001, 'genre': ['western'],
+                                                              'category': categories[1]['slug']})
+        assert response.status_code == 201, (
+            'Проверьте, что новый жанр сразу доступен при создании тайтла'
+        )
+        assert client.get('/api/v1/titles/?genre=western').json()['count'] == 1
+
+        admin_client.delete(f'/api/v1/categories/{categories[0]["slug"]}/')
+        assert client.get(f'/api/v1/titles/?category={categories[0]["slug"]}').json()['count'] == 0
+        response = admin_client.post('/api/v1/titles/', data={'name': 'Третий', 'year': 2002, 'genre': ['western'],
+                                                              'category': categories[0]['slug']})
+        assert response.status_code == 400, (
+            'Проверьте, что удаленная категория больше не принимается при создании тайтла'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_03_stale_table_and_unknown_slugs(self, admin_client, client):
+        genres = create_genre(admin_client)
+        categories = create_categories(admin_client)
+        data = {'name': 'Тайтл', 'year': 2000, 'genre': [genres[0]['slug']], 'category': categories[0]['slug']}
+        assert admin_client.post('/api/v1/titles/', data=data).status_code == 201
+
+        # Удаление в другом процессе не меняет версию в кэше этого процесса.
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM reviews_category WHERE slug = %s', [categories[1]['slug']])
+        response = admin_client.post('/api/v1/titles/', data={**data, 'category': categories[1]['slug']})
+        assert response.status_code == 400, (
+            'Проверьте, что категория, удаленная в другом процессе, не дает ошибку 500 при создании тайтла'
+        )
+
+        def table_reads(url):
+            with CaptureQueriesContext(connection) as context:
+                assert client.get(url).status_code == 200
+            return [query['sql'] for query in context.captured_queries
+                    if 'FROM "reviews_genre"' in query['sql']]
+
+        genre_slugs.missed = None
+        assert len(table_reads('/api/v1/titles/?genre=bogus1')) == 1
+        assert not table_reads('/api/v1/titles/?genre=bogus2'), (
+            'Проверьте, что неизвестные slug перечитывают таблицу не чаще раза в SLUG_LOOKUP_MISS_INTERVAL'
+        )
+        genre_slugs.missed = None
+        assert len(table_reads('/api/v1/titles/?genre__in=bogus3,bogus4,bogus5')) == 1, (
+            'Проверьте, что список неизвестных slug перечитывает таблицу один раз'
+        )
@@ -0,0 +1,70 @@
+import csv
+import os
+
+import pytest
+from django.core.management import call_command
+
+from reviews.models import Comment, Genre, Review, Title, User
+
+from .conftest import MANAGE_PATH
+
+DATA_PATH = os.path.join(MANAGE_PATH, 'static', 'data')
+
+
+def csv_rows(name):
+    with open(os.path.join(DATA_PATH, f'{name}.csv'), encoding='utf-8', newline='') as csv_file:
+        return list(csv.DictReader(csv_file))
+
+
+class Test15ImportCsv:
+
+    def test_01_dependency_order(self):
+        from api.management.commands.import_csv import CSV_TABLES, dependency_order
+
+        tables = dict(reversed(list(CSV_TABLES.items())))
+        order = dependency_order(tables)
+        assert order.index('users') < order.index('review') < order.index('comments')
+        assert order.index('category') < order.index('titles') < order.index('genre_title')
+        assert order.index('genre') < order.index('genre_title')
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_import_static_data(self, client):
+        call_command('import_csv', batch_size=7, stdout=open(os.devnull, 'w'))
+
+        assert User.objects.count() == len(csv_rows('users'))
+        assert Genre.objects.count() == len(csv_rows('genre'))
+        assert Title.genre.through.objects.count() == len(csv_rows('genre_title'))
+        assert Comment.objects.count() == len(csv_rows('comments'))
+        reviews = csv_rows('review')
+        assert Review.objects.count() == len(reviews)
+
+        review = Review.objects.get(pk=reviews[0]['id'])
+        assert review.author_id == int(reviews[0]['author'])
+        assert review.pub_date.isoformat().startswith(reviews[0]['pub_date'][:19]), (
+            'Проверьте, что `import_csv` сохраняет даты из выгрузки'
+        )
+
+        scores = [int(row['score']) for row in reviews if row['title_id'] == reviews[0]['title_id']]
+        response = client.get(f'/api/v1/titles/{reviews[0]["title_id"]}/')
+        assert response.json()['rating'] == sum(scores) / len(scores), (
+            'Проверьте, что после `import_csv` у тайтлов посчитан рейтинг'
+        )
+        response = client.get('/api/v1/titles/')
+        assert response.json()['count'] == len(csv_rows('titles'))
+
+    @pytest.mark.django_db(transaction=True)
+    def test_03_import_changes_title_etag(self, client):
+        call_command('import_csv', 'users', 'category', 'genre', 'titles', stdout=open(os.devnull, 'w'))
+        link = csv_rows('genre_title')[0]
+        url = f'/api/v1/titles/{link["title_id"]}/'
+        response = client.get(url)
+        assert response.json()['genre'] == []
+
+        call_command('import_csv', 'genre_title', stdout=open(os.devnull, 'w'))
+        response = client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        assert response.status_code == 200 and response.json()['genre'], (
+            'Проверьте, что импорт связей с жанрами меняет `ETag` и кэш ответов о тайтлах'
+        )
+        assert Title.objects.get(pk=link['title_id']).revision > 0, (
+            'Проверьте, что `import_csv` поднимает ревизию импортированных тайтлов'
+        )
@@ -0,0 +1,122 @@
+import csv
+import io
+import os
+import shutil
+
+import pytest
+from django.core.management import call_command
+
+from reviews.models import Genre, Title
+
+from .conftest import MANAGE_PATH
+
+DATA_PATH = os.path.join(MANAGE_PATH, 'static', 'data')
+CATALOG = ('category', 'genre', 'titles', 'genre_title')
+
+
+def copy_catalog(path):
+    for name in CATALOG:
+        shutil.copy(os.path.join(DATA_PATH, f'{name}.csv'), path)
+
+
+def rewrite(path, name, change):
+    filename = os.path.join(path, f'{name}.csv')
+    with open(filename, encoding='utf-8', newline='') as csv_file:
+        reader = csv.DictReader(csv_file)
+        fieldnames = reader.fieldnames
+        rows = change(list(reader))
+    with open(filename, 'w', encoding='utf-8', newline='') as csv_file:
+        writer = csv.DictWriter(csv_file, fieldnames)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def sync(path, **options):
+    out = io.StringIO()
+    call_command('import_csv', incremental=True, path=str(path),
+                 stdout=out, **options)
+    return out.getvalue()
+
+
+class Test16ImportIncremental:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_sync_only_changes(self, tmp_path):
+        copy_catalog(tmp_path)
+        sync(tmp_path)
+        titles = Title.objects.count()
+        links = Title.genre.through.objects.count()
+
+        output = sync(tmp_path)
+        assert 'titles: добавлено 0, изменено 0, удалено 0' in output, (
+            'Проверьте, что повторная синхронизация без изменений '
+            'ничего не пишет в базу'
+        )
+
+        def change_titles(rows):
+            rows[0]['name'] = 'Побег из Шоушенка (режиссерская версия)'
+            rows.append(dict(rows[1], id='1000', name='Новый тайтл'))
+            return rows
+
+        rewrite(tmp_path, 'titles', change_titles)
+        rewrite(tmp_path, 'genre_title', lambda rows: rows[1:])
+        revision = Title.objects.get(pk=1).revision
+
+        output = sync(tmp_path)
+        assert 'titles: добавлено 1, изменено 1, удалено 0' in output
+        assert 'genre_title: добавлено 0, изменено 0, удалено 1' in output
+        assert 'genre: добавлено 0, изменено 0, удалено 0' in output
+        assert Title.objects.count() == titles + 1
+        assert Title.genre.through.objects.count() == links - 1
+        title = Title.objects.get(pk=1)
+        assert title.name == 'Побег из Шоушенка (режиссерская версия)'
+        assert title.revision > revision, (
+            'Проверьте, что инкрементальная загрузка меняет ревизию '
+            'измененных тайтлов'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_dry_run(self, tmp_path):
+        copy_catalog(tmp_path)
+        sync(tmp_path)
+        genres = Genre.objects.count()
+
+        def change_genres(rows):
+            rows[0]['name'] = 'Драма и мелодрама'
+            return rows[:-1]
+
+        rewrite(tmp_path, 'genre', change_genres)
+        output = sync(tmp_path, dry_run=True)
+        assert '~ reviews_genre 1' in output
+        assert 'genre: добавлено 0, изменено 1, удалено 1' in output
+        assert Genre.objects.count() == genres, (
+            'Проверьте, что `--dry-run` не меняет базу'
+        )
+        assert Genre.objects.get(pk=1).name == 'Драма'
+
+        sync(tmp_path)
+        assert Genre.objects.count() == genres - 1
+        assert Genre.objects.get(pk=1).name == 'Драма и мелодрама'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_03_catalog_rename_touches_titles(self, tmp_path):
+        copy_catalog(tmp_path)
+        sync(tmp_path)
+        title = Title.objects.filter(category=1).first()
+        with_genre = Title.objects.filter(genre=1).first()
+
+        def rename(rows):
+            rows[0]['name'] = rows[0]['name'] + ' (новое название)'
+            return rows
+
+        rewrite(tmp_path, 'category', rename)
+        rewrite(tmp_path, 'genre', rename)
+        sync(tmp_path)
+        assert Title.objects.get(pk=title.pk).revision > title.revision, (
+            'Проверьте, что переименование категории при синхронизации '
+            'меняет ревизию ее тайтлов'
+        )
+        assert Title.objects.get(pk=with_genre.pk).revision > with_genre.revision, (
+            'Проверьте, что переименование жанра при синхронизации '
+            'меняет ревизию его тайтлов'
+        )
@@ -0,0 +1,127 @@
+import io
+from datetime import timedelta
+
+import pytest
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.core.management import call_command
+from django.utils import timezone
+
+from reviews.models import OutboxEmail
+
+
+class FailingBackend(EmailBackend):
+
+    def __init__(self, fail_for=(), **kwargs):
+        super().__init__(**kwargs)
+        self.fail_for = fail_for
+
+    def send_messages(self, messages):
+        for message in messages:
+            if set(message.to) & set(self.fail_for):
+                raise ConnectionError('mail server is down')
+        return super().send_messages(messages)
+
+
+class UnreachableBackend(EmailBackend):
+
+    def open(self):
+        raise ConnectionRefusedError('connection refused')
+
+
+def signup(client, username):
+    return client.post('/api/v1/auth/signup/', data={
+        'username': username, 'email': f'{username}@yamdb.fake'
+    })
+
+
+class Test17EmailOutbox:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_signup_enqueues_email(self, client):
+        response = signup(client, 'outbox_user')
+        assert response.status_code == 200
+        assert len(mail.outbox) == 0, (
+            'Проверьте, что регистрация не отправляет письмо сама, '
+            'а кладет его в очередь'
+        )
+        email = OutboxEmail.objects.get()
+        assert email.to == 'outbox_user@yamdb.fake'
+        assert 'Confirmation code' in email.body
+
+        call_command('send_outbox', stdout=io.StringIO())
+        assert len(mail.outbox) == 1, (
+            'Проверьте, что `send_outbox` отправляет письма из очереди'
+        )
+        assert mail.outbox[0].to == ['outbox_user@yamdb.fake']
+        email.refresh_from_db()
+        assert email.sent_at is not None
+
+        call_command('send_outbox', stdout=io.StringIO())
+        assert len(mail.outbox) == 1, (
+            'Проверьте, что отправленное письмо не уходит повторно'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_retry_with_backoff(self, settings):
+        from api.outbox import deliver_outbox, enqueue_email
+
+        settings.OUTBOX_MAX_ATTEMPTS = 2
+        enqueue_email('Тема', 'ok', 'ok@yamdb.fake')
+        broken = enqueue_email('Тема', 'broken', 'broken@yamdb.fake')
+        backend = FailingBackend(fail_for=['broken@yamdb.fake'])
+
+        assert deliver_outbox(mail_connection=backend) == (1, 1)
+        broken.refresh_from_db()
+        assert broken.attempts == 1
+        assert 'mail server is down' in broken.last_error
+        assert broken.next_attempt_at > timezone.now() + timedelta(
+            seconds=settings.OUTBOX_RETRY_DELAY - 5
+        ), 'Проверьте, что упавшее письмо откладывается на время задержки'
+        assert deliver_outbox(mail_connection=backend) == (0, 0)
+
+        OutboxEmail.objects.filter(pk=broken.pk).update(
+            next_attempt_at=timezone.now()
+        )
+        assert deliver_outbox(mail_connection=backend) == (0, 1)
+        assert OutboxEmail.objects.failed().get() == broken, (
+            'Проверьте, что после OUTBOX_MAX_ATTEMPTS попыток письмо '
+            'больше не отправляется'
+        )
+        assert [message.to for message in mail.outbox] == [['ok@yamdb.fake']]
+
+    @pytest.mark.django_db(transaction=True)
+    def test_03_metrics(self, client, user_client, admin_client):
+        signup(client, 'metrics_user')
+        url = '/api/v1/metrics/'
+        assert client.get(url).status_code == 401
+        assert user_client.get(url).status_code == 403
+        response = admin_client.get(url)
+        assert response.status_code == 200
+        assert response.json()['outbox']['pending'] == 1, (
+            'Проверьте, что `/api/v1/metrics/` показывает глубину очереди'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_04_connection_failure_reschedules_batch(self, settings):
+        from api.outbox import deliver_outbox, enqueue_email
+
+        emails = [
+            enqueue_email('Тема', 'body', f'user{number}@yamdb.fake')
+            for number in range(3)
+        ]
+        assert deliver_outbox(mail_connection=UnreachableBackend()) == (0, 3), (
+            'Проверьте, что ошибка подключения к почтовому серверу '
+            'откладывает всю пачку, а не роняет обработчик'
+        )
+        for email in emails:
+            email.refresh_from_db()
+            assert email.sent_at is None
+            assert email.attempts == 1
+            assert 'connection refused' in email.last_error
+            assert email.next_attempt_at > timezone.now() + timedelta(
+                seconds=settings.OUTBOX_RETRY_DELAY - 5
+            )
+        assert deliver_outbox(mail_connection=UnreachableBackend()) == (0, 0)
+        assert deliver_outbox(mail_connection=EmailBackend()) == (0, 0)
+        assert len(mail.outbox) == 0
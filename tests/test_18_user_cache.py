@@ -0,0 +1,49 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+def user_queries(queries):
+    return [
+        query['sql'] for query in queries
+        if 'FROM "reviews_user"' in query['sql']
+    ]
+
+
+class Test18UserCache:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_user_loaded_once(self, user_client):
+        user_client.get('/api/v1/users/')
+        with CaptureQueriesContext(connection) as context:
+            response = user_client.get('/api/v1/users/')
+        assert response.status_code == 403
+        assert not user_queries(context.captured_queries), (
+            'Проверьте, что пользователь из токена берется из кэша '
+            'процесса без запроса к базе'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_invalidated_on_change(self, admin_client, user_client):
+        url = '/api/v1/users/'
+        assert user_client.get(url).status_code == 403
+
+        response = admin_client.patch(f'{url}TestUser/', data={'role': 'admin'})
+        assert response.status_code == 200
+        assert user_client.get(url).status_code == 200, (
+            'Проверьте, что смена роли пользователя сбрасывает его запись '
+            'в кэше'
+        )
+
+        user_client.patch(f'{url}me/', data={'bio': 'new bio'})
+        assert user_client.get(f'{url}me/').json()['bio'] == 'new bio'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_03_inactive_user(self, user, user_client):
+        assert user_client.get('/api/v1/users/me/').status_code == 200
+        user.is_active = False
+        user.save()
+        assert user_client.get('/api/v1/users/me/').status_code == 401, (
+            'Проверьте, что деактивированный пользователь сразу теряет '
+            'доступ'
+        )
@@ -0,0 +1,83 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from reviews.models import OutboxEmail, User
+
+
+def issue_token(client, username):
+    client.post('/api/v1/auth/signup/', data={
+        'username': username, 'email': f'{username}@yamdb.fake'
+    })
+    code = OutboxEmail.objects.get(to=f'{username}@yamdb.fake').body.split()[-1]
+    response = client.post('/api/v1/auth/token/', data={
+        'username': username, 'confirmation_code': code
+    })
+    assert response.status_code == 200
+    return response.json()['access']
+
+
+def bearer(token):
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+    return client
+
+
+class Test19RoleClaims:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_claims_in_token(self, client):
+        from rest_framework_simplejwt.tokens import AccessToken
+
+        token = AccessToken(issue_token(client, 'claims_user'))
+        user = User.objects.get(username='claims_user')
+        assert token['role'] == User.ROLE_USER
+        assert token['is_staff'] is False
+        assert token['role_version'] == user.role_version, (
+            'Проверьте, что в токен записываются роль и версия прав'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_permissions_without_user_query(self, client):
+        token = issue_token(client, 'claims_admin')
+        User.objects.filter(username='claims_admin').update(role=User.ROLE_ADMIN)
+        token = issue_token(client, 'claims_admin')
+        admin_client = bearer(token)
+        admin_client.get('/api/v1/users/')
+        with CaptureQueriesContext(connection) as context:
+            response = admin_client.post('/api/v1/genres/', data={
+                'name': 'Ужасы', 'slug': 'horror'
+            })
+        assert response.status_code == 201
+        assert not [
+            query for query in context.captured_queries
+            if 'FROM "reviews_user"' in query['sql']
+        ], 'Проверьте, что права проверяются по claims токена без запроса пользователя'
+
+        response = admin_client.get('/api/v1/users/me/')
+        assert response.json()['email'] == 'claims_admin@yamdb.fake', (
+            'Проверьте, что `/users/me/` отдает профиль из базы'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_03_demotion_invalidates_token(self, client, admin_client):
+        token = issue_token(client, 'claims_moder')
+        admin_client.patch('/api/v1/users/claims_moder/', data={'role': 'admin'})
+        response = bearer(token).get('/api/v1/users/')
+        assert response.status_code == 401, (
+            'Проверьте, что после смены роли старые токены не принимаются'
+        )
+
+        token = issue_token(client, 'claims_moder')
+        assert bearer(token).get('/api/v1/users/').status_code == 200
+        admin_client.patch('/api/v1/users/claims_moder/', data={'role': 'user'})
+        assert bearer(token).get('/api/v1/users/').status_code == 401, (
+            'Проверьте, что понижение роли отзывает выписанные токены'
+        )
+        admin_client.patch('/api/v1/users/claims_moder/', data={'bio': 'bio'})
+        token = issue_token(client, 'claims_moder')
+        admin_client.patch('/api/v1/users/claims_moder/', data={'bio': 'new bio'})
+        assert bearer(token).get('/api/v1/users/me/').status_code == 200, (
+            'Проверьте, что изменение профиля не отзывает токены'
+        )
@@ -0,0 +1,43 @@
+import time
+
+import pytest
+
+
+class Test20TokenCache:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_signature_checked_once(self, user_client, monkeypatch):
+        from rest_framework_simplejwt.authentication import JWTAuthentication
+
+        from api.authentication import token_cache
+
+        calls = []
+        validate = JWTAuthentication.get_validated_token
+
+        def counting(self, raw_token):
+            calls.append(raw_token)
+            return validate(self, raw_token)
+
+        monkeypatch.setattr(JWTAuthentication, 'get_validated_token', counting)
+        hits = token_cache.hits
+        for _ in range(3):
+            assert user_client.get('/api/v1/titles/').status_code == 200
+        assert len(calls) == 1, (
+            'Проверьте, что подпись одного и того же токена проверяется один раз'
+        )
+        assert token_cache.hits == hits + 2
+
+    def test_02_expiry_and_size(self, settings):
+        from api.authentication import TokenCache
+
+        settings.TOKEN_CACHE_SIZE = 2
+        cache = TokenCache()
+        cache.set('expired', {'exp': time.time() - 1})
+        assert cache.get('expired') is None, (
+            'Проверьте, что токен не живет в кэше дольше своего срока'
+        )
+        for name in ('first', 'second', 'third'):
+            cache.set(name, {'exp': time.time() + 60})
+        assert cache.get('first') is None
+        assert cache.get('third') is not None
+        assert len(cache.tokens) == 2, 'Проверьте, что размер LRU ограничен'
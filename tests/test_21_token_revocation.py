@@ -0,0 +1,157 @@
+import io
+from datetime import timedelta
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from reviews.models import RevokedToken
+
+
+def bearer(token):
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+    return client
+
+
+class Test21TokenRevocation:
+
+    def test_01_bloom_filter(self):
+        from api.revocation import BloomFilter
+
+        bloom = BloomFilter(1000, 0.01)
+        for number in range(1000):
+            bloom.add(f'jti-{number}')
+        assert all(f'jti-{number}' in bloom for number in range(1000)), (
+            'Проверьте, что у фильтра Блума нет ложноотрицательных ответов'
+        )
+        false_positives = sum(f'other-{number}' in bloom for number in range(10000))
+        assert false_positives < 300
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_revoked_token_rejected(self, user):
+        from api.revocation import revoke_token
+
+        token, other = AccessToken.for_user(user), AccessToken.for_user(user)
+        assert bearer(token).get('/api/v1/titles/').status_code == 200
+        with CaptureQueriesContext(connection) as context:
+            assert bearer(token).get('/api/v1/titles/').status_code == 200
+        assert not [
+            query for query in context.captured_queries
+            if 'reviews_revokedtoken' in query['sql']
+        ], 'Проверьте, что неотозванный токен проверяется без запросов к базе'
+
+        revoke_token(token, user)
+        assert bearer(str(token)).get('/api/v1/titles/').status_code == 401, (
+            'Проверьте, что отозванный токен не принимается'
+        )
+        assert bearer(str(other)).get('/api/v1/titles/').status_code == 200
+
+    @pytest.mark.django_db(transaction=True)
+    def test_03_revoked_in_other_process(self, user, settings):
+        from api.revocation import revocation_list
+
+        token = AccessToken.for_user(user)
+        assert bearer(str(token)).get('/api/v1/titles/').status_code == 200
+        RevokedToken.objects.create(
+            jti=token['jti'], user=user, expires_at=token.current_time
+        )
+        settings.REVOCATION_REFRESH_INTERVAL = 0
+        assert bearer(str(token)).get('/api/v1/titles/').status_code == 401, (
+            'Проверьте, что фильтр дочитывает записи, добавленные другими процессами'
+        )
+        assert revocation_list.stats()['revoked'] >= 1
+
+    @pytest.mark.django_db(transaction=True)
+    def test_04_admin_revokes_all_user_tokens(self, user, rf):
+        from django.contrib import admin
+
+        from api.tokens import RoleRefreshToken
+        from reviews.models import User
+
+        tokens = [str(RoleRefreshToken.for_user(user).access_token) for _ in range(2)]
+        assert bearer(tokens[0]).get('/api/v1/titles/').status_code == 200
+
+        model_admin = admin.site._registry[User]
+        model_admin.message_user = lambda request, message: None
+        model_admin.revoke_tokens(rf.post('/'), User.objects.filter(pk=user.pk))
+        for token in tokens:
+            assert bearer(token).get('/api/v1/titles/').status_code == 401, (
+                'Проверьте, что действие админки отзывает все токены пользователя'
+            )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_05_rebuilt_filter_published_filled(self, settings, monkeypatch):
+        from api.revocation import BloomFilter, RevocationList
+
+        settings.REVOCATION_BLOOM_CAPACITY = 2
+        expires = timezone.now() + timedelta(days=1)
+        RevokedToken.objects.bulk_create(
+            [RevokedToken(jti=f'jti-{number}', expires_at=expires) for number in range(3)]
+        )
+        revocation = RevocationList()
+        revocation.refresh(force=True)
+        # Переполненный фильтр пересобирается при следующем обновлении.
+        revocation.bloom.count = revocation.bloom.capacity
+        published = []
+        add = BloomFilter.add
+
+        def checked_add(bloom, value):
+            # Пока фильтр заполняется, проверки видят старый фильтр.
+            published.append(revocation.bloom is not bloom)
+            add(bloom, value)
+
+        monkeypatch.setattr(BloomFilter, 'add', checked_add)
+        RevokedToken.objects.create(jti='jti-new', expires_at=expires)
+        revocation.refresh(force=True)
+        assert published and all(published), (
+            'Проверьте, что пересобранный фильтр Блума подменяет старый только после заполнения'
+        )
+        assert revocation.is_revoked('jti-new') and revocation.is_revoked('jti-0')
+
+        revocation.reset()
+        assert revocation.is_revoked('jti-new'), (
+            'Проверьте, что без фильтра Блума отзыв проверяется по таблице'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_06_admin_revokes_plain_tokens(self, user, user_superuser, rf):
+        from django.contrib import admin
+
+        from reviews.models import User
+
+        token = str(AccessToken.for_user(user))
+        other = str(AccessToken.for_user(user_superuser))
+        assert bearer(token).get('/api/v1/titles/').status_code == 200
+
+        model_admin = admin.site._registry[User]
+        model_admin.message_user = lambda request, message: None
+        model_admin.revoke_tokens(rf.post('/'), User.objects.filter(pk=user.pk))
+        assert bearer(token).get('/api/v1/titles/').status_code == 401, (
+            'Проверьте, что действие админки отзывает и токены без ролей'
+        )
+        assert bearer(other).get('/api/v1/titles/').status_code == 200
+
+    @pytest.mark.django_db(transaction=True)
+    def test_07_revoke_endpoint_and_command(self, user):
+        from api.tokens import RoleRefreshToken
+
+        token, other = AccessToken.for_user(user), AccessToken.for_user(user)
+        response = bearer(str(token)).post('/api/v1/auth/revoke/')
+        assert response.status_code == 204
+        assert bearer(str(token)).get('/api/v1/titles/').status_code == 401, (
+            'Проверьте, что `/api/v1/auth/revoke/` отзывает токен запроса'
+        )
+        assert RevokedToken.objects.filter(jti=token['jti'], user=user).exists()
+        assert bearer(str(other)).get('/api/v1/titles/').status_code == 200
+
+        role_token = str(RoleRefreshToken.for_user(user).access_token)
+        call_command('revoke_tokens', user.username, stdout=io.StringIO())
+        for token in (other, role_token):
+            assert bearer(str(token)).get('/api/v1/titles/').status_code == 401, (
+                'Проверьте, что команда revoke_tokens отзывает все токены пользователя'
+            )
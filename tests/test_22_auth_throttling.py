@@ -0,0 +1,72 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+class Test22AuthThrottling:
+    url_signup = '/api/v1/auth/signup/'
+    url_token = '/api/v1/auth/token/'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_signup_per_ip(self, client, settings):
+        settings.REST_FRAMEWORK = dict(settings.REST_FRAMEWORK, DEFAULT_THROTTLE_RATES={
+            **settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'], 'signup_ip': '3/min'
+        })
+        for number in range(3):
+            response = client.post(self.url_signup, data={
+                'username': f'bot{number}', 'email': f'bot{number}@yamdb.fake'
+            })
+            assert response.status_code == 200
+        with CaptureQueriesContext(connection) as context:
+            response = client.post(self.url_signup, data={
+                'username': 'bot3', 'email': 'bot3@yamdb.fake'
+            })
+        assert response.status_code == 429, (
+            f'Проверьте, что частые запросы к `{self.url_signup}` с одного IP отклоняются'
+        )
+        assert int(response['Retry-After']) > 0
+        assert not context.captured_queries, (
+            'Проверьте, что отклоненный запрос не обращается к базе'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_token_per_username(self, client, admin_client):
+        from api.throttling import throttle_stats
+
+        data = {'username': 'TestUser', 'confirmation_code': 'wrong'}
+        statuses = [
+            client.post(self.url_token, data=data, REMOTE_ADDR=f'10.0.0.{number}').status_code
+            for number in range(12)
+        ]
+        assert 429 in statuses, (
+            f'Проверьте, что перебор кодов для одного username в `{self.url_token}` '
+            'ограничен даже с разных IP'
+        )
+        assert throttle_stats()['token_username.rejected'] >= 1
+        response = admin_client.get('/api/v1/metrics/')
+        assert 'throttle' in response.json()
+
+    def test_03_bucket_refill(self):
+        from api.throttling import LocalBucketStore
+
+        store = LocalBucketStore()
+        assert store.consume('key', 2, 1, now=100.0) is None
+        assert store.consume('key', 2, 1, now=100.0) is None
+        assert store.consume('key', 2, 1, now=100.0) == pytest.approx(1.0)
+        assert store.consume('key', 2, 1, now=101.5) is None, (
+            'Проверьте, что ведро пополняется со временем'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_04_spoofed_forwarded_for(self, client, settings):
+        settings.REST_FRAMEWORK = dict(settings.REST_FRAMEWORK, DEFAULT_THROTTLE_RATES={
+            **settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'], 'signup_ip': '2/min'
+        })
+        statuses = [
+            client.post(self.url_signup, data={'username': f'bot{number}', 'email': f'bot{number}@yamdb.fake'},
+                        HTTP_X_FORWARDED_FOR=f'203.0.113.{number}').status_code
+            for number in range(3)
+        ]
+        assert statuses == [200, 200, 429], (
+            'Проверьте, что подделанный X-Forwarded-For не дает нового ведра жетонов'
+        )
@@ -0,0 +1,53 @@
+import pytest
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from reviews.models import Category
+
+
+class Test23SqlitePragmas:
+
+    @pytest.mark.django_db
+    def test_01_pragmas_applied(self, settings):
+        if connection.vendor != 'sqlite':
+            pytest.skip('PRAGMA есть только у SQLite')
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            busy_timeout = cursor.fetchone()[0]
+            cursor.execute('PRAGMA synchronous')
+            synchronous = cursor.fetchone()[0]
+        assert busy_timeout == int(settings.SQLITE_PRAGMAS['busy_timeout']), (
+            'Проверьте, что PRAGMA из SQLITE_PRAGMAS применяются к новым соединениям'
+        )
+        assert synchronous == 1, 'Проверьте, что по умолчанию synchronous=NORMAL'
+
+    @pytest.mark.django_db
+    def test_02_invalid_value_rejected(self, settings):
+        from reviews.db import apply_sqlite_pragmas
+
+        if connection.vendor != 'sqlite':
+            pytest.skip('PRAGMA есть только у SQLite')
+        settings.SQLITE_PRAGMAS = {'busy_timeout': '1; DROP TABLE reviews_title'}
+        with pytest.raises(ValueError):
+            apply_sqlite_pragmas(None, connection)
+        settings.SQLITE_PRAGMAS = {'busy_timeout': '', 'cache_size': '-4000'}
+        apply_sqlite_pragmas(None, connection)
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA cache_size')
+            assert cursor.fetchone()[0] == -4000
+
+    @pytest.mark.django_db(transaction=True)
+    def test_03_transactions_begin_immediate(self, settings):
+        from reviews.db import apply_sqlite_pragmas
+
+        if connection.vendor != 'sqlite':
+            pytest.skip('BEGIN IMMEDIATE есть только у SQLite')
+        with CaptureQueriesContext(connection) as context:
+            with transaction.atomic():
+                Category.objects.count()
+        assert context.captured_queries[0]['sql'] == 'BEGIN IMMEDIATE', (
+            'Проверьте, что atomic() в SQLite сразу берет блокировку записи'
+        )
+        settings.SQLITE_TRANSACTION_MODE = 'IMMEDIATE; DROP TABLE reviews_title'
+        with pytest.raises(ValueError):
+            apply_sqlite_pragmas(None, connection)
@@ -0,0 +1,109 @@
+import pytest
+from django.core.management import call_command
+from django.db import connections
+
+from reviews.models import Category
+
+
+@pytest.fixture
+def replica(settings, tmp_path):
+    """ Вторая база SQLite в файле играет роль реплики. """
+    if connections['default'].vendor != 'sqlite':
+        pytest.skip('Реплика в файле есть только у SQLite')
+    config = dict(connections.databases['default'])
+    config.update(NAME=str(tmp_path / 'replica.sqlite3'), TEST={'MIRROR': None})
+    connections.databases['replica1'] = config
+    settings.DATABASE_REPLICAS = {'replica1': 1}
+    call_command('migrate', database='replica1', verbosity=0)
+    yield 'replica1'
+    connections['replica1'].close()
+    del connections.databases['replica1']
+    if hasattr(connections._connections, 'replica1'):
+        delattr(connections._connections, 'replica1')
+
+
+class Test25ReplicaRouter:
+
+    def test_01_weighted_round_robin(self):
+        from api.replicas import WeightedRoundRobin
+
+        balancer = WeightedRoundRobin()
+        weights = {'replica1': 3, 'replica2': 1}
+        chosen = [balancer.choose(weights) for _ in range(8)]
+        assert chosen.count('replica1') == 6 and chosen.count('replica2') == 2, (
+            'Проверьте, что чтения распределяются по весам реплик'
+        )
+        assert 'replica2' in chosen[:4], 'Проверьте, что чтения не идут пачками'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_reads_from_replica_and_sticks_after_write(self, replica, admin_client):
+        Category.objects.using(replica).create(name='С реплики', slug='replica')
+
+        response = admin_client.get('/api/v1/categories/')
+        assert [item['slug'] for item in response.json()['results']] == ['replica'], (
+            'Проверьте, что безопасные запросы читают с реплики'
+        )
+
+        response = admin_client.post('/api/v1/categories/', data={
+            'name': 'С основной', 'slug': 'primary'
+        })
+        assert response.status_code == 201
+        assert not Category.objects.using(replica).filter(slug='primary').exists()
+        response = admin_client.get('/api/v1/categories/')
+        assert [item['slug'] for item in response.json()['results']] == ['primary'], (
+            'Проверьте, что после записи клиент читает с основной базы'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_03_writes_and_other_views_use_primary(self, replica, admin_client, settings):
+        from django.db import router
+
+        from api.replicas import read_from_replica
+
+        assert router.db_for_read(Category) == 'default'
+        token = read_from_replica.set(replica)
+        try:
+            assert router.db_for_read(Category) == replica
+            assert router.db_for_write(Category) == 'default'
+        finally:
+            read_from_replica.reset(token)
+        settings.DATABASE_REPLICAS = {}
+        assert admin_client.get('/api/v1/categories/').status_code == 200
+
+    @pytest.mark.django_db(transaction=True)
+    def test_04_replica_reads_fill_no_caches(self, replica, admin_client, client, settings):
+        Category.objects.using(replica).create(name='С реплики', slug='replica')
+        Category.objects.create(name='С основной', slug='primary')
+
+        response = client.get('/api/v1/categories/')
+        assert [item['slug'] for item in response.json()['results']] == ['replica']
+        settings.DATABASE_REPLICAS = {}
+        response = client.get('/api/v1/categories/')
+        assert [item['slug'] for item in response.json()['results']] == ['primary'], (
+            'Проверьте, что ответы, прочитанные с реплики, не попадают в кэш ответов'
+        )
+        settings.DATABASE_REPLICAS = {replica: 1}
+
+        response = admin_client.post('/api/v1/categories/', data={'name': 'Без slug'})
+        assert response.status_code == 400
+        response = admin_client.get('/api/v1/categories/')
+        assert [item['slug'] for item in response.json()['results']] == ['replica'], (
+            'Проверьте, что неудачная запись не переключает клиента на основную базу'
+        )
+
+    def test_05_alias_chosen_once(self, settings):
+        from django.db import router
+
+        from api.replicas import balancer, read_from_replica
+
+        settings.DATABASE_REPLICAS = {'replica1': 1, 'replica2': 1}
+        current = dict(balancer.current)
+        token = read_from_replica.set('replica2')
+        try:
+            aliases = {router.db_for_read(Category) for _ in range(4)}
+        finally:
+            read_from_replica.reset(token)
+        assert aliases == {'replica2'} and balancer.current == current, (
+            'Проверьте, что db_for_read возвращает реплику, выбранную для запроса, '
+            'и не сдвигает балансировщик'
+        )
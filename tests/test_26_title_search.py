@@ -0,0 +1,101 @@
+import pytest
+from django.core.management import call_command
+from django.db import connection
+
+from reviews.models import Category, Title
+
+TITLES = [
+    ('Побег из Шоушенка', 'Драма о тюрьме и надежде'),
+    ('Ёжик в тумане', 'Мультфильм про ежика и его друга медвежонка'),
+    ('Шоу Трумана', 'Жизнь человека как телевизионное шоу'),
+    ('Туман', 'Ужасы по роману Стивена Кинга'),
+]
+
+
+def create_titles():
+    category = Category.objects.create(name='Фильм', slug='movie')
+    return {
+        name: Title.objects.create(
+            name=name, description=description, year=2000, category=category
+        ).id
+        for name, description in TITLES
+    }
+
+
+def search(client, query, extra=''):
+    response = client.get(f'/api/v1/titles/?search={query}{extra}')
+    assert response.status_code == 200
+    return [title['name'] for title in response.json()['results']]
+
+
+class Test26TitleSearch:
+
+    def test_01_match_expression(self):
+        from reviews.fts import match_expression
+
+        assert match_expression('побег шоушенк') == '"побег"* "шоушенк"*'
+        assert match_expression('NOT "x" OR name:y*') == '"NOT"* "x"* "OR"* "name"* "y"*'
+        assert match_expression(' -*" ') is None
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_ranked_prefix_search(self, client):
+        if connection.vendor != 'sqlite':
+            pytest.skip('FTS5 есть только у SQLite')
+        create_titles()
+        assert search(client, 'шоушенк') == ['Побег из Шоушенка'], (
+            'Проверьте, что `?search=` ищет по префиксу слова без учета регистра'
+        )
+        assert search(client, 'туман')[:2] == ['Туман', 'Ёжик в тумане'], (
+            'Проверьте, что совпадение в коротком названии выше в выдаче'
+        )
+        assert search(client, 'ежик') == ['Ёжик в тумане'], (
+            'Проверьте, что поиск не различает "е" и "ё"'
+        )
+        assert search(client, 'кинга') == ['Туман'], (
+            'Проверьте, что `?search=` ищет и по описанию'
+        )
+        assert search(client, 'туман', '&ordering=-name') == ['Туман', 'Ёжик в тумане']
+
+    @pytest.mark.django_db(transaction=True)
+    def test_03_index_follows_changes(self, client):
+        if connection.vendor != 'sqlite':
+            pytest.skip('FTS5 есть только у SQLite')
+        ids = create_titles()
+        Title.objects.filter(pk=ids['Туман']).update(name='Мгла')
+        Title.objects.filter(pk=ids['Шоу Трумана']).delete()
+        assert search(client, 'мгла') == ['Мгла']
+        assert search(client, 'туман') == ['Ёжик в тумане']
+        assert search(client, 'трумана') == [], (
+            'Проверьте, что индекс поиска обновляется при изменении и удалении тайтлов'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_04_fallback_without_fts(self, client, monkeypatch):
+        from reviews import fts
+
+        create_titles()
+        monkeypatch.setattr(fts, '_available', {
+            (connection.alias, 'reviews_title'): False
+        })
+        assert search(client, 'в тумане') == ['Ёжик в тумане'], (
+            'Проверьте, что без FTS5 `?search=` работает как фильтр по названию'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_05_triggers_restored_after_migrate(self, client):
+        if connection.vendor != 'sqlite':
+            pytest.skip('FTS5 есть только у SQLite')
+        ids = create_titles()
+        # Так триггеры пропадают, когда миграция пересоздает таблицу.
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TRIGGER reviews_title_fts_au')
+        Title.objects.filter(pk=ids['Туман']).update(name='Мгла')
+
+        call_command('migrate', verbosity=0)
+        assert search(client, 'мгла') == ['Мгла'], (
+            'Проверьте, что после migrate индекс перестраивается по записям без триггеров'
+        )
+        Title.objects.filter(pk=ids['Туман']).update(name='Дымка')
+        assert search(client, 'дымка') == ['Дымка'], (
+            'Проверьте, что migrate создает заново потерянные триггеры поиска'
+        )
@@ -0,0 +1,95 @@
+from datetime import timedelta
+
+import pytest
+from django.db import connection
+from django.utils import timezone
+
+from reviews.models import Category, Comment, Review, Title
+
+URL = '/api/v1/moderation/search/'
+
+
+def create_texts(user, moderator):
+    category = Category.objects.create(name='Фильм', slug='movie')
+    first = Title.objects.create(name='Первый', year=2000, category=category)
+    second = Title.objects.create(name='Второй', year=2000, category=category)
+    reviews = [
+        Review.objects.create(title=first, author=user, score=3,
+                              text='Скучный фильм, спойлер: герой выживает'),
+        Review.objects.create(title=second, author=user, score=9,
+                              text='Отличная игра актеров'),
+        Review.objects.create(title=second, author=moderator, score=5,
+                              text='Спойлеры в каждом трейлере'),
+    ]
+    comment = Comment.objects.create(review=reviews[1], author=moderator,
+                                     text='Не пишите спойлеры в отзывах')
+    return first, second, reviews, comment
+
+
+class Test27TextSearch:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_permissions(self, client, user_client, moderator_client):
+        assert client.get(URL, {'q': 'фильм'}).status_code == 401
+        assert user_client.get(URL, {'q': 'фильм'}).status_code == 403
+        assert moderator_client.get(URL, {'q': 'фильм'}).status_code == 200
+        assert moderator_client.get(URL, {'q': '*'}).status_code == 400
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_search_and_filters(self, user, moderator, moderator_client):
+        first, second, reviews, comment = create_texts(user, moderator)
+
+        results = moderator_client.get(URL, {'q': 'спойлер'}).json()['results']
+        assert [item['id'] for item in results] == [reviews[2].id, reviews[0].id], (
+            'Проверьте, что поиск находит отзывы по префиксу слова, новые первыми'
+        )
+        assert results[0]['type'] == 'review'
+        assert results[0]['title_id'] == second.id
+        assert results[0]['author'] == moderator.username
+        if connection.vendor == 'sqlite':
+            assert '**Спойлеры**' in results[0]['snippet'], (
+                'Проверьте, что в выдаче есть фрагмент с подсвеченным совпадением'
+            )
+
+        def ids(**params):
+            response = moderator_client.get(URL, {'q': 'спойлер', **params})
+            return [item['id'] for item in response.json()['results']]
+
+        assert ids(title=first.id) == [reviews[0].id]
+        assert ids(author=user.username) == [reviews[0].id]
+        assert ids(author='nobody') == []
+        tomorrow = (timezone.now() + timedelta(days=1)).isoformat()
+        assert ids(since=tomorrow) == []
+        assert ids(until=tomorrow) == [reviews[2].id, reviews[0].id]
+
+        response = moderator_client.get(URL, {'q': 'спойлеры', 'type': 'comment'})
+        result, = response.json()['results']
+        assert (result['type'], result['id']) == ('comment', comment.id)
+        assert result['review_id'] == reviews[1].id
+        assert result['title_id'] == second.id
+
+    @pytest.mark.django_db(transaction=True)
+    def test_03_keyset_pages(self, user, moderator_client, settings):
+        from api.pagination import RowidKeysetPagination
+
+        category = Category.objects.create(name='Фильм', slug='movie')
+        titles = [Title.objects.create(name=f'Тайтл {n}', year=2000, category=category)
+                  for n in range(25)]
+        expected = [
+            Review.objects.create(title=title, author=user, score=5,
+                                  text=f'Отзыв номер {n}').id
+            for n, title in enumerate(titles)
+        ][::-1]
+
+        seen, url, params = [], URL, {'q': 'отзыв'}
+        while url:
+            page = moderator_client.get(url, params).json()
+            params = None
+            assert len(page['results']) <= RowidKeysetPagination.page_size
+            seen += [item['id'] for item in page['results']]
+            url = page['next']
+        assert seen == expected, (
+            'Проверьте, что страницы выдачи поиска идут по ключу без пропусков и повторов'
+        )
+        previous = moderator_client.get(page['previous']).json()
+        assert [item['id'] for item in previous['results']] == expected[10:20]
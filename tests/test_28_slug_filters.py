@@ -0,0 +1,102 @@
+import importlib
+
+import pytest
+from django.apps import apps
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from reviews.models import Category, Genre, Title
+
+
+class Test28SlugFilters:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_slugs_stored_lowercase(self, admin_client):
+        response = admin_client.post('/api/v1/categories/', data={'name': 'Фильм', 'slug': 'Films'})
+        assert response.status_code == 201
+        assert response.json()['slug'] == 'films', (
+            'Проверьте, что slug категории сохраняется в нижнем регистре'
+        )
+        response = admin_client.post('/api/v1/categories/', data={'name': 'Фильм', 'slug': 'FILMS'})
+        assert response.status_code == 400, (
+            'Проверьте, что slug, отличающийся только регистром, не проходит проверку уникальности'
+        )
+        assert Genre.objects.create(name='Ужасы', slug='Horror').slug == 'horror'
+
+        response = admin_client.post('/api/v1/titles/', data={
+            'name': 'Тайтл', 'year': 2000, 'genre': ['HORROR'], 'category': 'Films'
+        })
+        assert response.status_code == 201
+        assert response.json()['category'] == 'films'
+        assert response.json()['genre'] == ['horror']
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_exact_filters_without_duplicates(self, client):
+        category = Category.objects.create(name='Фильм', slug='films')
+        horror = Genre.objects.create(name='Ужасы', slug='horror')
+        comedy = Genre.objects.create(name='Комедия', slug='comedy')
+        title = Title.objects.create(name='Тайтл', year=2000, category=category)
+        title.genre.set([horror, comedy])
+        Title.objects.create(name='Без жанра', year=2000, category=category)
+
+        with CaptureQueriesContext(connection) as context:
+            response = client.get('/api/v1/titles/?genre=Horror&category=FILMS')
+        assert response.status_code == 200
+        assert response.json()['count'] == 1
+        assert [item['name'] for item in response.json()['results']] == ['Тайтл']
+        sql = ' '.join(
+            query['sql'] for query in context.captured_queries
+            if 'FROM "reviews_title" ' in query['sql']
+        )
+        assert '"reviews_title"."id" IN (SELECT' in sql, (
+            'Проверьте, что фильтр по жанру идет подзапросом к таблице связей'
+        )
+        for fragment in ('UPPER(', ' LIKE ', 'DISTINCT', 'JOIN "reviews_title_genre"', 'JOIN "reviews_genre"'):
+            assert fragment not in sql, (
+                f'Проверьте, что фильтры по slug не используют {fragment.strip()}'
+            )
+
+        assert client.get('/api/v1/titles/?genre=missing').json()['count'] == 0
+        assert client.get('/api/v1/titles/?category=missing').json()['count'] == 0
+
+    @pytest.mark.django_db(transaction=True)
+    def test_03_migration_merges_case_duplicates(self):
+        migration = importlib.import_module('reviews.migrations.0012_lowercase_slugs')
+        lower = Category.objects.create(name='Фильм', slug='films')
+        upper = Category.objects.create(name='Фильмы', slug='upper')
+        single = Category.objects.create(name='Книги', slug='books')
+        Category.objects.filter(pk=upper.pk).update(slug='Films')
+        Category.objects.filter(pk=single.pk).update(slug='Books')
+        horror = Genre.objects.create(name='Ужасы', slug='horror')
+        upper_horror = Genre.objects.create(name='Ужасы', slug='upper')
+        Genre.objects.filter(pk=upper_horror.pk).update(slug='HORROR')
+        both = Title.objects.create(name='Оба', year=2000, category=upper)
+        both.genre.set([horror, upper_horror])
+        moved = Title.objects.create(name='Переезд', year=2000, category=single)
+        moved.genre.set([upper_horror])
+
+        with connection.schema_editor() as schema_editor:
+            migration.lowercase_slugs(apps, schema_editor)
+
+        assert sorted(Category.objects.values_list('slug', flat=True)) == ['books', 'films']
+        assert list(Genre.objects.values_list('slug', flat=True)) == ['horror']
+        both.refresh_from_db()
+        moved.refresh_from_db()
+        assert both.category_id == lower.pk
+        assert moved.category_id == single.pk
+        assert list(both.genre.values_list('pk', flat=True)) == [horror.pk]
+        assert list(moved.genre.values_list('pk', flat=True)) == [horror.pk]
+
+    @pytest.mark.django_db(transaction=True)
+    def test_04_admin_form_checks_lowercase_slug(self, admin_user):
+        admin_client = Client()
+        admin_client.force_login(admin_user)
+        Category.objects.create(name='Фильм', slug='films')
+        response = admin_client.post('/admin/reviews/category/add/', data={'name': 'Фильмы', 'slug': 'Films'})
+        assert response.status_code == 200 and Category.objects.count() == 1, (
+            'Проверьте, что админка отклоняет slug, отличающийся от существующего только регистром'
+        )
+        response = admin_client.post('/admin/reviews/genre/add/', data={'name': 'Ужасы', 'slug': 'Horror'})
+        assert response.status_code == 302
+        assert Genre.objects.get().slug == 'horror'
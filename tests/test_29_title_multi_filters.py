@@ -0,0 +1,74 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from reviews.models import Category, Genre, Title
+
+
+def create_catalog():
+    films = Category.objects.create(name='Фильм', slug='films')
+    books = Category.objects.create(name='Книги', slug='books')
+    music = Category.objects.create(name='Музыка', slug='music')
+    horror = Genre.objects.create(name='Ужасы', slug='horror')
+    comedy = Genre.objects.create(name='Комедия', slug='comedy')
+    drama = Genre.objects.create(name='Драма', slug='drama')
+    for name, year, category, genres in (
+        ('Оба жанра', 1990, films, [horror, comedy]),
+        ('Все три', 2000, books, [horror, comedy, drama]),
+        ('Только ужасы', 2010, films, [horror]),
+        ('Только драма', 2020, music, [drama]),
+        ('Без жанра', 2005, books, []),
+    ):
+        Title.objects.create(name=name, year=year, category=category).genre.set(genres)
+
+
+def names(client, query):
+    response = client.get(f'/api/v1/titles/?{query}')
+    assert response.status_code == 200
+    assert response.json()['count'] == len(response.json()['results'])
+    return sorted(title['name'] for title in response.json()['results'])
+
+
+class Test29TitleMultiFilters:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_genre_in_and_all(self, client):
+        create_catalog()
+        assert names(client, 'genre__in=horror,comedy') == ['Все три', 'Оба жанра', 'Только ужасы'], (
+            'Проверьте, что genre__in отдает тайтлы хотя бы с одним жанром без повторов'
+        )
+        assert names(client, 'genre__in=drama,missing') == ['Все три', 'Только драма']
+        assert names(client, 'genre__in=missing') == []
+        assert names(client, 'genre__all=horror,comedy') == ['Все три', 'Оба жанра'], (
+            'Проверьте, что genre__all отдает тайтлы со всеми жанрами списка'
+        )
+        assert names(client, 'genre__all=horror,Comedy,drama') == ['Все три']
+        assert names(client, 'genre__all=horror,horror') == ['Все три', 'Оба жанра', 'Только ужасы']
+        assert names(client, 'genre__all=horror,missing') == [], (
+            'Проверьте, что genre__all с неизвестным жанром ничего не находит'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_category_in_and_year_range(self, client):
+        create_catalog()
+        assert names(client, 'category__in=films,music') == ['Оба жанра', 'Только драма', 'Только ужасы']
+        assert names(client, 'year_min=2000&year_max=2010') == ['Без жанра', 'Все три', 'Только ужасы']
+        assert names(client, 'category__in=books,films&year_min=2001&genre__in=horror,drama') == [
+            'Только ужасы'
+        ]
+
+    @pytest.mark.django_db(transaction=True)
+    def test_03_single_query(self, client):
+        create_catalog()
+        client.get('/api/v1/titles/?genre__all=horror,comedy&category__in=films,books')
+        with CaptureQueriesContext(connection) as context:
+            response = client.get('/api/v1/titles/?genre__all=horror,comedy&category__in=films,books&year_min=1980')
+        assert response.json()['count'] == 2
+        title_queries = [query['sql'] for query in context.captured_queries
+                         if 'FROM "reviews_title" ' in query['sql']]
+        assert len(title_queries) == 2, (
+            'Проверьте, что список с фильтрами строится одним запросом страницы и одним COUNT'
+        )
+        for sql in title_queries:
+            assert 'HAVING COUNT' in sql
+            assert 'DISTINCT' not in sql and 'JOIN "reviews_title_genre"' not in sql
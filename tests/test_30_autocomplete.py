@@ -0,0 +1,156 @@
+import pytest
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from reviews.models import Category, Genre, Title
+
+URL = '/api/v1/autocomplete/'
+
+
+def create_catalog():
+    category = Category.objects.create(name='Фильм', slug='movie')
+    Genre.objects.create(name='Фэнтези', slug='fantasy')
+    Genre.objects.create(name='Фантастика', slug='sci-fi')
+    titles = {}
+    for name, rating in (('Побег из Шоушенка', 9.1), ('Шоу Трумана', 8.2),
+                         ('Ёжик в тумане', 8.9), ('Шоубизнес', None), ('Фантом', 5.0)):
+        titles[name] = Title.objects.create(name=name, year=2000, category=category, rating=rating)
+    return titles
+
+
+def suggest(client, q, **params):
+    response = client.get(URL, {'q': q, **params})
+    assert response.status_code == 200
+    return response.json()
+
+
+def title_names(client, q, **params):
+    return [title['name'] for title in suggest(client, q, **params)['titles']]
+
+
+class Test30Autocomplete:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_prefix_ranked_by_rating(self, client):
+        create_catalog()
+        assert title_names(client, 'шоу') == ['Побег из Шоушенка', 'Шоу Трумана', 'Шоубизнес'], (
+            'Проверьте, что подсказки ищут по началу любого слова и идут по убыванию рейтинга'
+        )
+        assert title_names(client, 'ежик') == ['Ёжик в тумане']
+        assert title_names(client, 'побег шоу') == ['Побег из Шоушенка']
+        assert title_names(client, 'шоу', limit=1) == ['Побег из Шоушенка']
+        result = suggest(client, 'фан')
+        assert [genre['slug'] for genre in result['genres']] == ['sci-fi']
+        assert result['titles'] == [
+            {'id': Title.objects.get(name='Фантом').id, 'name': 'Фантом', 'year': 2000, 'rating': 5.0}
+        ]
+        assert suggest(client, 'фил')['categories'] == [{'name': 'Фильм', 'slug': 'movie'}]
+        assert suggest(client, '  ') == {'titles': [], 'genres': [], 'categories': []}
+        assert client.get(URL, {'q': 'шоу', 'limit': 1000}).status_code == 400
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_no_database_queries(self, client):
+        create_catalog()
+        suggest(client, 'шоу')
+        with CaptureQueriesContext(connection) as context:
+            assert title_names(client, 'туман') == ['Ёжик в тумане']
+        assert not context.captured_queries, (
+            'Проверьте, что подсказки отдаются из памяти без запросов к базе'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_03_local_writes_update_index(self, client):
+        titles = create_catalog()
+        suggest(client, 'шоу')
+        title = titles['Шоубизнес']
+        title.name = 'Шоу должно продолжаться'
+        title.save()
+        Title.objects.create(name='Шоураннер', year=2020, rating=9.9)
+        titles['Шоу Трумана'].delete()
+        Genre.objects.create(name='Фантасмагория', slug='phantasmagoria')
+        assert title_names(client, 'шоу') == ['Шоураннер', 'Побег из Шоушенка', 'Шоу должно продолжаться'], (
+            'Проверьте, что изменения тайтлов в этом процессе сразу видны в подсказках'
+        )
+        assert title_names(client, 'шоубиз') == []
+        assert [genre['slug'] for genre in suggest(client, 'фантас')['genres']] == ['phantasmagoria', 'sci-fi']
+
+    @pytest.mark.django_db(transaction=True)
+    def test_04_refresh_picks_up_other_processes(self, client, settings):
+        titles = create_catalog()
+        suggest(client, 'шоу')
+        # Записи мимо сигналов - как из другого процесса.
+        Title.objects.filter(pk=titles['Шоубизнес'].pk).update(rating=10, modified=timezone.now())
+        Genre.objects.filter(slug='fantasy').update(name='Фанфик')
+        assert title_names(client, 'шоу') == ['Побег из Шоушенка', 'Шоу Трумана', 'Шоубизнес']
+
+        # Версии моделей в кэше этого процесса не меняются.
+        settings.AUTOCOMPLETE_REFRESH_INTERVAL = 0
+        assert title_names(client, 'шоу') == ['Шоубизнес', 'Побег из Шоушенка', 'Шоу Трумана'], (
+            'Проверьте, что индекс дочитывает тайтлы, измененные в других процессах'
+        )
+        assert [genre['slug'] for genre in suggest(client, 'фанф')['genres']] == ['fantasy']
+
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM reviews_title WHERE id = %s', [titles['Шоу Трумана'].pk])
+        assert title_names(client, 'шоу') == ['Шоубизнес', 'Побег из Шоушенка'], (
+            'Проверьте, что тайтлы, удаленные в других процессах, пропадают из подсказок'
+        )
+
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM reviews_title WHERE id = %s', [titles['Шоубизнес'].pk])
+        Title.objects.bulk_create([Title(name='Шоураннер', year=2000, category=titles['Фантом'].category)])
+        assert title_names(client, 'шоу') == ['Побег из Шоушенка', 'Шоураннер'], (
+            'Проверьте, что удаление вместе с созданием тайтла в другом процессе не остается в подсказках'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_05_short_prefix_scan(self, client, settings):
+        create_catalog()
+        settings.AUTOCOMPLETE_SCAN_LIMIT = 0
+        assert title_names(client, 'ш') == ['Побег из Шоушенка', 'Шоу Трумана', 'Шоубизнес']
+        assert title_names(client, 'ш', limit=2) == ['Побег из Шоушенка', 'Шоу Трумана']
+
+    def test_06_selective_prefix_and_scan_cap(self, settings):
+        from api.autocomplete import PrefixIndex, title_entry
+
+        index = PrefixIndex()
+        for pk in range(1, 101):
+            index.add(*title_entry(pk, f'кадр {pk}', 2000, 100 - pk))
+        index.add(*title_entry(1000, 'кадр зубр', 2000, None))
+        settings.AUTOCOMPLETE_SCAN_LIMIT = 10
+        settings.AUTOCOMPLETE_MAX_SCAN = 5
+        assert [row[0] for row in index.search(['кад', 'зу'], 10)] == [1000], (
+            'Проверьте, что кандидаты берутся по самому избирательному префиксу'
+        )
+        assert [row[0] for row in index.search(['кад'], 10)] == [1, 2, 3, 4, 5], (
+            'Проверьте, что обход по рейтингу ограничен AUTOCOMPLETE_MAX_SCAN записями'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_07_rolled_back_writes_not_indexed(self, client):
+        titles = create_catalog()
+        suggest(client, 'фан')
+        with pytest.raises(RuntimeError):
+            with transaction.atomic():
+                Genre.objects.create(name='Фантасмагория', slug='phantasmagoria')
+                titles['Фантом'].delete()
+                raise RuntimeError
+        result = suggest(client, 'фантас')
+        assert [genre['slug'] for genre in result['genres']] == ['sci-fi'], (
+            'Проверьте, что откаченные изменения не попадают в подсказки'
+        )
+        assert title_names(client, 'фантом') == ['Фантом']
+
+    @pytest.mark.django_db(transaction=True)
+    def test_08_warm_builds_index(self, client):
+        from api.autocomplete import autocomplete
+
+        create_catalog()
+        autocomplete.reset()
+        autocomplete.warm().join()
+        with CaptureQueriesContext(connection) as context:
+            assert title_names(client, 'туман') == ['Ёжик в тумане']
+        assert not context.captured_queries, (
+            'Проверьте, что warm() собирает индекс до первого запроса'
+        )